@@ -0,0 +1,116 @@
+"""
+임베딩 백엔드(PyTorch / ONNX / ONNX int8) 비교 벤치마크
+
+- 처리량 : 문서 청크 전체를 embed_documents 로 임베딩할 때 초당 청크 수
+- 지연 시간 : 질문 1건 embed_query 의 p50 / p95 (ms)
+- 검색 재현율 : PyTorch 벡터로 찾은 top-k 청크 중 각 백엔드 벡터로도 top-k 에 든 비율 (recall@k)
+  및 같은 청크에 대한 PyTorch 벡터와의 평균 코사인 유사도
+
+문서는 PDF 또는 TXT 파일을 앱과 같은 방식(500자 / 50자 겹침)으로 분할하여 사용하고,
+질문은 --queries 파일(한 줄에 하나)이 없으면 임의로 고른 청크의 앞부분을 사용합니다.
+ONNX 모델은 먼저 'python download_model.py --onnx --skip-download' 로 생성해야 합니다.
+
+사용법: python benchmarks/embedding_backends.py <PDF/TXT 파일 경로> [--queries 질문.txt] [--top-k 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from pybo.rag.onnx_embeddings import ONNX_MODEL_FILES, OnnxSentenceEmbeddings, get_onnx_model_path
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "local_models", "jhgan_ko-sroberta-multitask")
+
+
+def load_chunks(filepath: str):
+    loader = PyPDFLoader(filepath) if filepath.lower().endswith(".pdf") else TextLoader(filepath, encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    docs = splitter.split_documents(loader.load())
+    return [doc.page_content for doc in docs if doc.page_content and doc.page_content.strip()]
+
+
+def load_backends(batch_size: int, threads: int):
+    backends = {"torch": HuggingFaceEmbeddings(model_name=MODEL_DIR, model_kwargs={"device": "cpu"},
+                                               encode_kwargs={"batch_size": batch_size})}
+    for backend in ONNX_MODEL_FILES:
+        onnx_path = get_onnx_model_path(MODEL_DIR, backend)
+        if os.path.exists(onnx_path):
+            backends[backend] = OnnxSentenceEmbeddings(MODEL_DIR, onnx_path, batch_size=batch_size, num_threads=threads)
+        else:
+            print(f"  {backend}: {onnx_path} 없음, 건너뜀")
+    return backends
+
+
+def normalize(vectors) -> np.ndarray:
+    array = np.asarray(vectors, dtype=np.float32)
+    return array / np.clip(np.linalg.norm(array, axis=-1, keepdims=True), 1e-12, None)
+
+
+def top_k(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(query_vectors @ doc_vectors.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--queries", help="질문 파일 (한 줄에 하나)")
+    parser.add_argument("--num-queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op 스레드 수 (0이면 자동)")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.file)
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        random.seed(0)
+        queries = [chunk[:60] for chunk in random.sample(chunks, min(args.num_queries, len(chunks)))]
+    print(f"문서: {args.file} ({len(chunks)} chunks), 질문 {len(queries)}개, top-k={args.top_k}")
+
+    results = {}
+    for name, model in load_backends(args.batch_size, args.threads).items():
+        model.embed_documents(chunks[:args.batch_size])  # 워밍업
+
+        start_time = time.perf_counter()
+        doc_vectors = normalize(model.embed_documents(chunks))
+        doc_seconds = time.perf_counter() - start_time
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            start_time = time.perf_counter()
+            query_vectors.append(model.embed_query(query))
+            latencies.append((time.perf_counter() - start_time) * 1000)
+
+        results[name] = {
+            "docs_per_second": len(chunks) / doc_seconds,
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p95": float(np.percentile(latencies, 95)),
+            "doc_vectors": doc_vectors,
+            "top_k": top_k(normalize(query_vectors), doc_vectors, args.top_k),
+        }
+
+    reference = results["torch"]
+    print(f"{'backend':10s} {'docs/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'recall@k':>9s} {'cosine':>7s}")
+    for name, result in results.items():
+        recall = np.mean([len(set(ref) & set(got)) / args.top_k
+                          for ref, got in zip(reference["top_k"], result["top_k"])])
+        cosine = float(np.mean(np.sum(reference["doc_vectors"] * result["doc_vectors"], axis=1)))
+        print(f"{name:10s} {result['docs_per_second']:9.1f} {result['latency_p50']:8.1f} "
+              f"{result['latency_p95']:8.1f} {recall:9.3f} {cosine:7.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+문서 임베딩 배치 방식 비교 벤치마크 (인덱싱 처리량)
+
+- fixed  : 기존 방식 (문서 순서대로 100개씩 잘라 embed_documents, 모델 내부 배치 32)
+- budget : 토큰 수 순으로 정렬하여 토큰 예산(배치 크기 x 최대 토큰 수) 단위로 묶은 뒤 원래 순서로 복원
+           (models.CachedQueryEmbeddings 와 같은 token_lengths / plan_token_budget_batches 사용,
+            토큰 수를 구하기 위한 추가 토큰화 시간도 측정에 포함)
+
+각 방식의 초당 청크 수와, 모델에 들어간 패딩 포함 토큰 수 대비 실제 토큰 비율(패딩 효율)을 출력합니다.
+두 방식의 벡터가 같은지(최대 절대 오차)도 함께 확인합니다.
+
+사용법: python benchmarks/embedding_batching.py <PDF/TXT 파일 경로> [--backend torch|onnx|onnx-int8]
+        [--token-budget 4096] [--max-batch-size 64]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from pybo.rag.models import plan_token_budget_batches, token_lengths
+from pybo.rag.onnx_embeddings import OnnxSentenceEmbeddings, get_onnx_model_path
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "local_models", "jhgan_ko-sroberta-multitask")
+FIXED_SLICE_SIZE = 100  # 기존 INDEX_BATCH_SIZE
+FIXED_MODEL_BATCH_SIZE = 32  # sentence-transformers 기본 배치 크기
+
+
+def load_chunks(filepath: str):
+    loader = PyPDFLoader(filepath) if filepath.lower().endswith(".pdf") else TextLoader(filepath, encoding="utf-8")
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    docs = splitter.split_documents(loader.load())
+    return [doc.page_content for doc in docs if doc.page_content and doc.page_content.strip()]
+
+
+def load_model(backend: str, batch_size: int):
+    if backend == "torch":
+        return HuggingFaceEmbeddings(model_name=MODEL_DIR, model_kwargs={"device": "cpu"},
+                                     encode_kwargs={"batch_size": batch_size})
+    return OnnxSentenceEmbeddings(MODEL_DIR, get_onnx_model_path(MODEL_DIR, backend), batch_size=batch_size)
+
+
+def padded_tokens(lengths, batches) -> int:
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+def run_fixed(model, texts):
+    vectors = []
+    for i in range(0, len(texts), FIXED_SLICE_SIZE):
+        vectors.extend(model.embed_documents(texts[i:i + FIXED_SLICE_SIZE]))
+    return vectors
+
+
+def run_budget(model, texts, token_budget: int, max_batch_size: int):
+    # 토큰 수 계산(텍스트를 한 번 더 토큰화)도 실제 인덱싱 경로와 같이 측정 시간에 포함
+    lengths = token_lengths(model, texts)
+    vectors = [None] * len(texts)
+    for batch in plan_token_budget_batches(lengths, token_budget, max_batch_size):
+        for i, vector in zip(batch, model.embed_documents([texts[i] for i in batch])):
+            vectors[i] = vector
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--backend", choices=["torch", "onnx", "onnx-int8"], default="torch")
+    parser.add_argument("--token-budget", type=int, default=4096)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_chunks(args.file)
+    fixed_model = load_model(args.backend, FIXED_MODEL_BATCH_SIZE)
+    budget_model = load_model(args.backend, args.max_batch_size)
+    lengths = token_lengths(budget_model, texts)
+    print(f"문서: {args.file} ({len(texts)} chunks, 토큰 수 min={min(lengths)} / "
+          f"median={int(np.median(lengths))} / max={max(lengths)}), backend={args.backend}")
+
+    # 패딩 효율: 기존 방식은 100개 조각 안에서 모델 배치(32)로 나뉨 (torch 는 조각 안에서 길이순 정렬)
+    fixed_batches = []
+    for start in range(0, len(texts), FIXED_SLICE_SIZE):
+        order = list(range(start, min(start + FIXED_SLICE_SIZE, len(texts))))
+        if args.backend == "torch":
+            order.sort(key=lambda i: -lengths[i])
+        fixed_batches.extend(order[i:i + FIXED_MODEL_BATCH_SIZE] for i in range(0, len(order), FIXED_MODEL_BATCH_SIZE))
+    budget_batches = plan_token_budget_batches(lengths, args.token_budget, args.max_batch_size)
+
+    fixed_model.embed_documents(texts[:FIXED_MODEL_BATCH_SIZE])  # 워밍업
+    budget_model.embed_documents(texts[:FIXED_MODEL_BATCH_SIZE])
+
+    results = {}
+    for name, run in (("fixed", lambda: run_fixed(fixed_model, texts)),
+                      ("budget", lambda: run_budget(budget_model, texts, args.token_budget, args.max_batch_size))):
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            vectors = run()
+            timings.append(time.perf_counter() - start_time)
+        results[name] = {"seconds": min(timings), "vectors": np.asarray(vectors, dtype=np.float32)}
+
+    real_tokens = sum(lengths)
+    for name, batches in (("fixed", fixed_batches), ("budget", budget_batches)):
+        result = results[name]
+        print(f"  {name:6s} : {len(texts) / result['seconds']:7.1f} chunks/s ({result['seconds']:.2f}s, "
+              f"best of {args.repeat}), 배치 {len(batches)}개, 패딩 효율 {real_tokens / padded_tokens(lengths, batches):.1%}")
+    speedup = results["fixed"]["seconds"] / results["budget"]["seconds"]
+    max_error = float(np.abs(results["fixed"]["vectors"] - results["budget"]["vectors"]).max())
+    print(f"  처리량 {speedup:.2f}배, 벡터 최대 오차 {max_error:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+PDF 인덱싱 최대 메모리(peak RSS) 비교 벤치마크
+
+- eager : 기존 방식 (loader.load() 로 전체 페이지를 읽고, 전체 청크 목록을 만든 뒤 배치 임베딩)
+- lazy  : upload_utils.iter_chunk_batches (loader.lazy_load() 로 한 페이지씩 읽어 배치 단위로 처리)
+
+각 방식은 별도 프로세스에서 실행하여 최대 RSS(ru_maxrss)를 측정합니다.
+임베딩 모델과 ChromaDB의 메모리는 두 방식에서 같으므로, 고정 차원의 더미 벡터로 대체하여 문서 처리 부분만 비교합니다.
+
+사용법: python benchmarks/pdf_ingestion_memory.py <PDF 파일 경로> [--batch-size 100]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from pybo.rag.upload_utils import iter_chunk_batches
+
+EMBEDDING_DIM = 768  # jhgan/ko-sroberta-multitask 임베딩 차원
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 는 KB, macOS 는 byte 단위
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def fake_embed(texts):
+    return [[0.0] * EMBEDDING_DIM for _ in texts]
+
+
+def run_eager(filepath: str, batch_size: int) -> int:
+    pages = PyPDFLoader(filepath).load()
+    pages_with_content = [doc for doc in pages if doc.page_content and doc.page_content.strip()]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    docs = splitter.split_documents(pages_with_content)
+    final_docs = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
+    for i in range(0, len(final_docs), batch_size):
+        fake_embed([doc.page_content for doc in final_docs[i:i + batch_size]])
+    return len(final_docs)
+
+
+def run_lazy(filepath: str, batch_size: int) -> int:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    chunk_count = 0
+    for batch in iter_chunk_batches(PyPDFLoader(filepath).lazy_load(), splitter, filepath, batch_size):
+        fake_embed([doc.page_content for doc in batch])
+        chunk_count += len(batch)
+    return chunk_count
+
+
+def run_mode(mode: str, filepath: str, batch_size: int):
+    """자식 프로세스: 한 가지 방식만 실행하고 결과를 JSON 으로 출력"""
+    # 두 방식 모두 같은 모듈을 불러온 상태에서 기준 메모리를 측정
+    baseline = peak_rss_mb()
+    start_time = time.time()
+    chunk_count = (run_eager if mode == "eager" else run_lazy)(filepath, batch_size)
+    print(json.dumps({
+        "mode": mode,
+        "chunks": chunk_count,
+        "seconds": time.time() - start_time,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--mode", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.pdf, args.batch_size)
+        return
+
+    results = {}
+    for mode in ("eager", "lazy"):
+        output = subprocess.run(
+            [sys.executable, __file__, args.pdf, "--batch-size", str(args.batch_size), "--mode", mode],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"PDF: {args.pdf} (batch size {args.batch_size})")
+    for mode, result in results.items():
+        print(f"  {mode:5s} : {result['chunks']} chunks, {result['seconds']:.2f}s, "
+              f"peak RSS {result['peak_rss_mb']:.1f} MB (import 후 {result['baseline_rss_mb']:.1f} MB)")
+    eager_growth = results["eager"]["peak_rss_mb"] - results["eager"]["baseline_rss_mb"]
+    lazy_growth = results["lazy"]["peak_rss_mb"] - results["lazy"]["baseline_rss_mb"]
+    if eager_growth > 0:
+        print(f"  문서 처리 중 증가한 메모리: {eager_growth:.1f} MB -> {lazy_growth:.1f} MB "
+              f"({(1 - lazy_growth / eager_growth) * 100:.0f}% 감소)")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,12 +22,86 @@ CHAT_DB_PERSIST_DIR = 'chroma_db'   # ChromaDB 저장 폴더
 
 # Embedding 모델 설정
 EMBEDDING_MODEL = 'jhgan/ko-sroberta-multitask'
+EMBEDDING_BACKEND = 'torch'  # 'torch' | 'onnx' | 'onnx-int8' (ONNX 모델은 download_model.py --onnx 로 생성)
+EMBEDDING_ONNX_THREADS = 0  # ONNX Runtime intra-op 스레드 수 (0이면 자동)
+EMBEDDING_TOKEN_BUDGET = 4096  # 문서 임베딩 배치당 토큰 예산 (배치 크기 x 최대 토큰 수, 0이면 길이별 배치 비활성화)
+EMBEDDING_MAX_BATCH_SIZE = 64  # 문서 임베딩 배치의 최대 텍스트 수
+
+# 질문 임베딩 LRU 캐시 설정
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # 최대 캐시 항목 수 (0이면 캐시 비활성화)
+QUERY_EMBEDDING_CACHE_TTL = 3600  # 캐시 항목 유효 시간(초)
+
+# 질문 임베딩 마이크로 배치 설정 - 동시에 들어온 질문을 모아 한 번에 계산
+QUERY_EMBEDDING_BATCH_ENABLED = True
+QUERY_EMBEDDING_BATCH_MAX_SIZE = 16  # 한 배치의 최대 질문 수
+QUERY_EMBEDDING_BATCH_MAX_WAIT = 0.005  # 첫 질문 도착 후 다른 질문을 기다리는 최대 시간(초)
+QUERY_EMBEDDING_BATCH_TIMEOUT = 5.0  # 배치 결과를 기다리는 시간(초, MAX_WAIT 에 더해짐), 초과 시 요청 스레드에서 직접 계산
+
+# 문서(청크) 임베딩 디스크 캐시 설정 - 모델 이름 + 청크 텍스트 해시 기준
+EMBEDDING_DISK_CACHE_ENABLED = True
+EMBEDDING_DISK_CACHE_DIR = os.path.join(BASE_DIR, 'embedding_cache')  # 모델별 하위 폴더에 벡터(memmap)와 색인 저장
+
+# 챗봇 답변(시맨틱) 캐시 설정 - 대화 기록이 없는 첫 질문에만 적용
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95  # 코사인 유사도가 이 값 이상이면 저장된 답변 재사용
+ANSWER_CACHE_MAX_ENTRIES = 256  # 컬렉션별 최대 저장 답변 수
+ANSWER_CACHE_TTL = 3600  # 답변 유효 시간(초)
+
+# 대화형 RAG 체인 캐시 설정 (컬렉션 + k + LLM 설정 기준 LRU)
+CONVERSATIONAL_CHAIN_CACHE_SIZE = 32
+
+# 스트리밍 답변 임시 보관 설정 (다음 요청에서 세션에 병합되기 전까지 보관)
+STREAMED_ANSWER_TTL = 600  # 보관 시간(초), 지나면 병합되지 않고 제거
+STREAMED_ANSWER_MAX_ENTRIES = 1000  # 최대 보관 개수 (초과 시 오래된 항목부터 제거)
+
+# 전역 검색(문서 미선택 시 모든 file_ 컬렉션 검색) 설정
+RAG_GLOBAL_SEARCH_K = 3  # 병합 후 반환할 문서 수
+RAG_GLOBAL_SEARCH_TIMEOUT = 5.0  # 컬렉션별 검색 제한 시간(초)
+RAG_GLOBAL_SEARCH_MAX_WORKERS = 8  # 동시 검색 스레드 수
 
 # LLM 설정
 LLM_MODEL = 'gemma3n:latest'  # Ollama 모델 이름
 LLM_TEMPERATURE = 0.7  # LLM 온도 설정
 
 LLM_HOST = os.getenv("OLLAMA_HOST", 'http://localhost:11434')  # Ollama 서버 호스트
+LLM_MAX_IN_FLIGHT = 4  # Ollama 서버로 동시에 보내는 최대 생성 요청 수
+LLM_QUEUE_TIMEOUT = 120  # 생성 슬롯을 기다리는 최대 시간(초), 초과 시 요청 실패
+LLM_POOL_SIZE = 10  # keep-alive HTTP 연결 풀 크기
+LLM_REQUEST_TIMEOUT = 300  # 생성 요청 타임아웃(초)
+LLM_BACKGROUND_MAX_IN_FLIGHT = 1  # 백그라운드(평가) 요청의 최대 동시 실행 수
+
+# 답변 자동 평가(LLM-as-judge) 큐 설정
+EVAL_WORKERS = 1  # 평가 워커 스레드 수
+EVAL_QUEUE_MAX_SIZE = 100  # 대기열 최대 길이 (초과 시 평가 요청은 버려짐)
+EVAL_SAMPLE_RATE = 1.0  # 평가할 답변 비율 (0.0 ~ 1.0)
+EVAL_BATCH_SIZE = 4  # 대기열에 쌓인 답변을 한 번의 LLM 호출로 함께 평가할 최대 개수
+EVAL_LOG_RETENTION_DAYS = 0  # 평가 로그 보존 기간(일), 0 이면 삭제하지 않음
+EVAL_RESULTS_PER_PAGE = 10  # 평가 결과 페이지의 타입별 페이지 크기
+
+# 응답 시간 집계(히스토그램) 설정
+METRICS_FLUSH_INTERVAL = 10  # 프로세스에 누적된 히스토그램을 DB에 저장하는 주기(초)
+METRICS_RETENTION_DAYS = 7  # 히스토그램 보존 기간(일), 0 이면 삭제하지 않음
+METRICS_WINDOWS = [("최근 5분", 300), ("최근 1시간", 3600), ("최근 24시간", 86400)]  # 백분위 요약 구간
+METRICS_CHART_WINDOW = 21600  # 추이 차트에 표시할 기간(초)
+METRICS_CHART_STEP = 300  # 추이 차트의 구간 간격(초)
+
+# 요청 단위 트레이싱(단계별 스팬) 설정
+TRACING_ENABLED = True  # 체인 실행 스팬을 기록할지 여부
+TRACE_SAMPLE_RATE = 1.0  # 트레이스를 기록할 요청 비율 (0.0 ~ 1.0)
+TRACE_SINK_PATH = os.path.join(BASE_DIR, 'logs', 'traces.jsonl')  # 트레이스 JSONL 파일 경로 (한 줄 = 한 요청)
+
+# 업로드 파일 백그라운드 인덱싱 설정
+INGESTION_WORKERS = 2  # 동시에 실행할 인덱싱 작업 수
+INGESTION_JOB_TTL = 3600  # 완료/실패한 작업 상태를 보관하는 시간(초)
+
+# PDF 텍스트 추출 프로세스 풀 설정
+PDF_EXTRACT_WORKERS = min(2, os.cpu_count() or 1)  # 추출 작업 프로세스 수 (1 이면 현재 프로세스에서 추출)
+PDF_EXTRACT_PAGES_PER_TASK = 8  # 작업 하나가 추출하는 페이지 수
+PDF_EXTRACT_MIN_PAGES = 16  # 이보다 페이지가 적은 PDF는 프로세스 풀을 쓰지 않고 바로 추출
+
+# 인덱싱 배치 설정
+INDEX_BATCH_SIZE = 100  # 한 번에 임베딩/저장하는 청크 수
+INDEX_WRITE_QUEUE_SIZE = 2  # 임베딩이 끝나 ChromaDB 저장을 기다리는 배치의 최대 개수
 print(f" * Loading OLLAMA_HOST: {LLM_HOST}")
 CHROMA_HOST = os.getenv('CHROMA_HOST', 'localhost')
 CHROMA_PORT = os.getenv('CHROMA_PORT', '8000')
@@ -1,4 +1,5 @@
 from huggingface_hub import snapshot_download
+import argparse
 import os
 
 # 다운로드할 모델 이름
@@ -6,17 +7,83 @@ model_name = "jhgan/ko-sroberta-multitask"
 # 모델을 저장할 로컬 디렉터리
 local_dir = os.path.join(os.path.dirname(__file__), "local_models", model_name.replace("/", "_"))
 
-# 디렉터리가 없으면 생성
-os.makedirs(local_dir, exist_ok=True)
 
-print(f"'{model_name}' 모델을 다운로드합니다...")
-print(f"저장 위치: {local_dir}")
+# ONNX 변환 (EMBEDDING_BACKEND = 'onnx' / 'onnx-int8' 에서 사용)
+def export_onnx(model_dir: str):
+    """
+    <모델 폴더>/onnx/model.onnx (fp32) 를 만들고, onnx 패키지가 있으면 동적 int8 양자화한 model_int8.onnx 도 만듭니다.
+    출력은 토큰별 벡터(last_hidden_state)이며, mean pooling 은 pybo/rag/onnx_embeddings.py 에서 수행합니다.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
 
-# 모델 다운로드
-snapshot_download(
-    repo_id=model_name,
-    local_dir=local_dir,
-    local_dir_use_symlinks=False
-)
+    onnx_dir = os.path.join(model_dir, "onnx")
+    os.makedirs(onnx_dir, exist_ok=True)
+    onnx_path = os.path.join(onnx_dir, "model.onnx")
 
-print("다운로드 완료!")
+    class TokenEmbeddings(torch.nn.Module):
+        """출력을 last_hidden_state 하나로 고정하기 위한 래퍼"""
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = TokenEmbeddings(AutoModel.from_pretrained(model_dir)).eval()
+    sample = tokenizer(["ONNX 변환용 예시 문장입니다."], return_tensors="pt")
+
+    print(f"ONNX 모델로 변환합니다: {onnx_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            onnx_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(onnx_dir, "model_int8.onnx")
+        print(f"동적 int8 양자화 모델을 만듭니다: {int8_path}")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    except ImportError as e:
+        # onnxruntime.quantization 은 onnx 패키지가 필요함
+        print(f"int8 양자화를 건너뜁니다 ({e}). 'pip install onnx' 후 다시 실행하세요.")
+
+    print("ONNX 변환 완료!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="임베딩 모델 다운로드 및 ONNX 변환")
+    parser.add_argument("--onnx", action="store_true", help="다운로드 후 ONNX (fp32 / int8) 모델도 생성")
+    parser.add_argument("--skip-download", action="store_true", help="이미 받은 모델로 ONNX 변환만 실행")
+    args = parser.parse_args()
+
+    if not args.skip_download:
+        # 디렉터리가 없으면 생성
+        os.makedirs(local_dir, exist_ok=True)
+
+        print(f"'{model_name}' 모델을 다운로드합니다...")
+        print(f"저장 위치: {local_dir}")
+
+        # 모델 다운로드
+        snapshot_download(
+            repo_id=model_name,
+            local_dir=local_dir,
+            local_dir_use_symlinks=False
+        )
+
+        print("다운로드 완료!")
+
+    if args.onnx:
+        export_onnx(local_dir)
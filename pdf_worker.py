@@ -0,0 +1,31 @@
+# pdf_worker.py
+# PDF 텍스트 추출 작업 프로세스에서 실행되는 함수 (pybo/rag/pdf_extract.py 의 프로세스 풀에서 사용)
+# spawn 으로 생성된 작업 프로세스는 이 모듈만 불러오므로, pybo 패키지(Flask, torch, chromadb 등)를 import 하지 않도록
+# 패키지 밖에 두고 pypdf 만 사용한다.
+from typing import List
+
+from pypdf import PdfReader
+
+
+def document_metadata(reader: PdfReader, filepath: str) -> dict:
+    """PyPDFLoader 와 같은 형태의 문서 공통 메타데이터 (PDF 정보 + source, total_pages)"""
+    metadata = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    for key, value in (reader.metadata or {}).items():
+        if value is not None:
+            metadata[key.lstrip("/").lower()] = str(value)
+    metadata["source"] = filepath
+    metadata["total_pages"] = len(reader.pages)
+    return metadata
+
+
+def extract_page_range(filepath: str, start: int, end: int) -> List[tuple]:
+    """[start, end) 범위 페이지의 (텍스트, 메타데이터) 목록을 페이지 순서대로 반환합니다."""
+    reader = PdfReader(filepath)
+    base_metadata = document_metadata(reader, filepath)
+    page_labels = reader.page_labels
+    results = []
+    for page_number in range(start, min(end, len(reader.pages))):
+        text = reader.pages[page_number].extract_text(extraction_mode="plain")
+        metadata = {**base_metadata, "page": page_number, "page_label": page_labels[page_number]}
+        results.append((text, metadata))
+    return results
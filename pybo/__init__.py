@@ -27,6 +27,7 @@ migrate = Migrate()
 mail = Mail()
 from . import models  # 모델을 임포트하여 SQLAlchemy가 모델 클래스를 인식하도록 함
 from .rag import vectorstore # RAG 벡터스토어 초기화를 위해 추가
+from .rag import metrics # 응답 시간 집계 저장을 위해 추가
 
 def create_app():
     app = Flask(__name__)
@@ -41,6 +42,7 @@ def create_app():
     db.init_app(app)
     mail.init_app(app)
     vectorstore.init_app(app) # RAG 벡터스토어 초기화
+    metrics.init_app(app) # 응답 시간 히스토그램 주기적 저장
 
     if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
         migrate.init_app(app, db, render_as_batch=True)
@@ -51,12 +53,13 @@ def create_app():
     # 2025-07-25, question_views.py 파일에 등록한 블루프린트 적용을 위한 임포트 (app.register_blueprint() 메서드 사용)
     # 2025-07-25, answer_views.py 파일에 등록한 블루프린트 적용을 위한 임포트
     # 2025-08-11, comment_views.py 파일에 등록한 블루프린트 적용을 위한 임포트
-    from .views import main_views, question_views, answer_views, auth_views, comment_views
+    from .views import main_views, question_views, answer_views, auth_views, comment_views, metrics_views
     app.register_blueprint(main_views.bp)
     app.register_blueprint(question_views.bp)
     app.register_blueprint(answer_views.bp)
     app.register_blueprint(auth_views.bp)
     app.register_blueprint(comment_views.bp)
+    app.register_blueprint(metrics_views.bp)  # Prometheus 지표 (/metrics)
 
     # 필터
     from .filter import format_datetime
@@ -76,4 +76,49 @@ class Comment(db.Model):
     question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=True)
     question = db.relationship('Question', backref=db.backref('comment_set', cascade='all, delete-orphan'))
     answer_id = db.Column(db.Integer, db.ForeignKey('answer.id', ondelete='CASCADE'), nullable=True)
-    answer = db.relationship('Answer', backref=db.backref('comment_set', cascade='all, delete-orphan'))
\ No newline at end of file
+    answer = db.relationship('Answer', backref=db.backref('comment_set', cascade='all, delete-orphan'))
+
+# RAG 답변 평가 로그 모델 (평가 결과를 파일 대신 DB에 추가 전용으로 저장)
+'''
+log_type : 'normal_rag'(일반 챗봇) 또는 'sentiment_rag'(감정 분석)
+evaluation : 평가 기준별 결과 {기준: {"reasoning", "value", "score"}}
+extra_data : 감정 기록 등 로그 타입별 추가 데이터
+source_file : 기존 JSON 로그 파일에서 가져온 경우 원본 파일 경로 (중복 가져오기 방지)
+(log_type, create_date) 인덱스로 타입별 최신순 페이지 조회를 빠르게 처리한다.
+'''
+class EvaluationLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    log_type = db.Column(db.String(20), nullable=False)
+    create_date = db.Column(db.DateTime(), nullable=False)
+    question = db.Column(db.Text(), nullable=False)
+    prediction = db.Column(db.Text(), nullable=False)
+    reference = db.Column(db.Text(), nullable=True)
+    evaluation = db.Column(db.JSON(), nullable=False)
+    extra_data = db.Column(db.JSON(), nullable=True)
+    source_file = db.Column(db.String(255), unique=True, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_evaluation_log_log_type_create_date', 'log_type', 'create_date'),
+    )
+
+# 응답 시간 히스토그램 모델 (1분 구간 x 워커 x source x stage 단위로 누적)
+'''
+worker : 값을 기록한 프로세스 식별자(호스트:PID), 워커별로 행을 나누어 동시 저장 시 충돌을 막는다
+stage : 'total'(전체 응답), 'rewrite', 'retrieve', 'generate' 등 파이프라인 단계
+bucket_counts : pybo/rag/metrics.py 의 HISTOGRAM_BOUNDS 경계별 개수 목록
+조회 시 구간 내 행들의 bucket_counts 를 합산하여 p50/p95/p99 를 계산한다.
+'''
+class MetricHistogram(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime(), nullable=False)
+    worker = db.Column(db.String(100), nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    stage = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    max_value = db.Column(db.Float, nullable=False, default=0.0)
+    bucket_counts = db.Column(db.JSON(), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('bucket_start', 'worker', 'source', 'stage'),
+    )
@@ -0,0 +1,73 @@
+# pybo/rag/answer_cache.py
+import threading
+import time
+
+import numpy as np
+
+from . import vectorstore
+from .metrics import log_cache_hit, log_cache_miss
+
+# 컬렉션별 답변 캐시: {컬렉션 키: [{"embedding", "question", "answer", "created_at"}, ...]}
+answer_cache = {}
+answer_cache_lock = threading.Lock()
+
+
+def _normalize(vector) -> np.ndarray:
+    """코사인 유사도 계산을 위해 벡터를 단위 벡터로 변환합니다."""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+# 캐시된 답변을 찾는 함수
+def lookup_answer(collection_key: str, query_embedding, threshold: float = 0.95, ttl: float = 3600):
+    """
+    같은 컬렉션에 저장된 답변 중 질문 임베딩의 코사인 유사도가 threshold 이상인 가장 가까운 답변을 반환합니다.
+    찾지 못하면 None을 반환합니다.
+    """
+    query = _normalize(query_embedding)
+    now = time.time()
+    with answer_cache_lock:
+        entries = answer_cache.get(collection_key, [])
+        # 유효 시간이 지난 항목 정리
+        entries[:] = [entry for entry in entries if now - entry["created_at"] < ttl]
+        if entries:
+            similarities = np.stack([entry["embedding"] for entry in entries]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                log_cache_hit("answer")
+                print(f"[-RAG-] (Answer Cache) Hit for '{collection_key}' (similarity={similarities[best]:.4f})")
+                return entries[best]["answer"]
+    log_cache_miss("answer")
+    return None
+
+
+# 답변을 캐시에 저장하는 함수
+def store_answer(collection_key: str, question: str, query_embedding, answer: str, max_entries: int = 256):
+    """질문 임베딩과 답변을 컬렉션별 캐시에 저장합니다. max_entries 를 넘으면 오래된 항목부터 제거합니다."""
+    with answer_cache_lock:
+        entries = answer_cache.setdefault(collection_key, [])
+        entries.append({
+            "embedding": _normalize(query_embedding),
+            "question": question,
+            "answer": answer,
+            "created_at": time.time()
+        })
+        if len(entries) > max_entries:
+            del entries[:len(entries) - max_entries]
+
+
+# 컬렉션이 변경되었을 때 캐시를 비우는 함수
+def invalidate_answer_cache(collection_name: str = None):
+    """재인덱싱/삭제된 컬렉션의 답변과, 모든 파일을 대상으로 한 전역 검색 답변을 제거합니다."""
+    with answer_cache_lock:
+        if collection_name is None:
+            answer_cache.clear()
+        elif collection_name.startswith("file_"):
+            answer_cache.pop(collection_name, None)
+            answer_cache.pop(vectorstore.GLOBAL_COLLECTION_KEY, None)
+        else:
+            return
+    print(f"[-RAG-] (Answer Cache) Invalidated (collection: {collection_name}).")
+
+vectorstore.register_collection_change_hook(invalidate_answer_cache)
@@ -0,0 +1,153 @@
+# pybo/rag/embedding_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import List, Optional
+
+import numpy as np
+from filelock import FileLock
+
+# 디스크 임베딩 캐시 (모델별 하나, 첫 사용 시 생성)
+disk_embedding_caches = {}
+disk_embedding_caches_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    """캐시 키로 사용하는 텍스트의 SHA-256 해시"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingCache:
+    """
+    청크 텍스트 해시 -> 임베딩 벡터를 디스크에 저장하는 내용 기반 캐시입니다. 모델마다 별도 폴더를 사용합니다.
+    - vectors.f32 : float32 벡터를 행 단위로 이어 붙인 파일 (np.memmap 으로 읽음)
+    - index.tsv   : "텍스트 해시<TAB>행 번호" 를 한 줄씩 추가하는 색인
+    - meta.json   : 모델 이름과 벡터 차원
+    - cache.lock  : 쓰기용 파일 잠금
+    벡터를 먼저 쓰고 색인을 나중에 추가하므로, 쓰기 중 종료되어도 색인은 항상 완전히 기록된 행만 가리킵니다.
+    여러 프로세스(워커)가 같은 폴더를 함께 사용할 수 있습니다. 쓰기는 파일 잠금 안에서 하며, 추가할 행 번호는
+    잠금을 얻은 뒤의 vectors.f32 크기로 정하고, 그 사이 다른 프로세스가 추가한 색인을 먼저 읽어 중복을 건너뜁니다.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^0-9A-Za-z._-]+", "_", model_name))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.index_path = os.path.join(self.directory, "index.tsv")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.dim = None
+        self.index = {}  # {텍스트 해시: 행 번호}
+        self.rows = 0
+        self._index_offset = 0  # index.tsv 에서 이미 읽은 위치 (byte)
+        self._vectors = None  # 읽기 전용 memmap (행이 추가되면 다시 생성)
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.directory, "cache.lock"))
+        with self._lock, self._file_lock:
+            self._refresh(repair=True)
+        if self.dim is not None:
+            print(f"[-RAG-] (Embedding Cache) Loaded {len(self.index)} vectors (dim={self.dim}) from {self.directory}")
+
+    def _read_meta(self):
+        if self.dim is not None or not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model_name:
+            raise ValueError(f"임베딩 캐시 모델이 일치하지 않습니다: {meta.get('model')} != {self.model_name}")
+        self.dim = int(meta["dim"])
+
+    def _refresh(self, repair: bool = False):
+        """
+        다른 프로세스가 추가한 행과 색인 줄을 반영합니다. (self._lock 보유 상태에서 호출)
+        repair=True 는 파일 잠금을 가진 상태에서만 사용하며, 종료 등으로 일부만 기록된 마지막 행을 잘라냅니다.
+        """
+        self._read_meta()
+        if self.dim is None:
+            return
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        self.rows = size // row_bytes
+        if repair and size != self.rows * row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(self.rows * row_bytes)
+
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        # 끝까지 기록된 줄만 읽음 (쓰는 중인 마지막 줄은 다음에 읽음)
+        complete = data[:data.rfind(b"\n") + 1]
+        self._index_offset += len(complete)
+        for line in complete.decode("utf-8").splitlines():
+            parts = line.split("\t")
+            # 형식이 잘못된 줄이나 잘려 나간 행을 가리키는 줄은 무시
+            if len(parts) == 2 and parts[1].isdigit() and int(parts[1]) < self.rows:
+                self.index[parts[0]] = int(parts[1])
+
+    def _mapped_vectors(self) -> np.ndarray:
+        if self._vectors is None or self._vectors.shape[0] < self.rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        return self._vectors
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get_many(self, hashes: List[str]) -> List[Optional[List[float]]]:
+        """해시 목록의 벡터를 반환합니다. 캐시에 없는 항목은 None 입니다."""
+        with self._lock:
+            if any(key not in self.index for key in hashes):
+                # 다른 프로세스가 추가한 항목 확인 (추가분만 읽음)
+                self._refresh()
+            rows = [self.index.get(key) for key in hashes]
+            if all(row is None for row in rows):
+                return [None] * len(hashes)
+            vectors = self._mapped_vectors()
+            return [vectors[row].tolist() if row is not None else None for row in rows]
+
+    def put_many(self, hashes: List[str], vectors: List[List[float]]):
+        """해시와 벡터를 캐시에 추가합니다. 이미 있는 해시(다른 프로세스가 추가한 것 포함)는 건너뜁니다."""
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim != 2 or array.shape[0] != len(hashes):
+            raise ValueError(f"벡터 형태가 올바르지 않습니다: {array.shape}")
+        with self._lock, self._file_lock:
+            # 잠금을 얻은 뒤 파일 상태를 다시 읽어 행 번호와 중복 여부를 판단
+            self._refresh(repair=True)
+            if self.dim is None:
+                self.dim = array.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+            elif array.shape[1] != self.dim:
+                raise ValueError(f"벡터 차원이 캐시와 다릅니다: {array.shape[1]} != {self.dim}")
+
+            new_rows, new_keys = [], []
+            for key, vector in zip(hashes, array):
+                if key not in self.index and key not in new_keys:
+                    new_keys.append(key)
+                    new_rows.append(vector)
+            if not new_keys:
+                return
+
+            start_row = self.rows
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.stack(new_rows).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\t{start_row + i}\n" for i, key in enumerate(new_keys)))
+                f.flush()
+                os.fsync(f.fileno())
+            # 방금 추가한 행과 색인 줄 반영
+            self._refresh()
+
+
+# 모델별 디스크 임베딩 캐시를 반환하는 함수
+def get_disk_embedding_cache(directory: str, model_name: str) -> DiskEmbeddingCache:
+    key = (os.path.abspath(directory), model_name)
+    with disk_embedding_caches_lock:
+        if key not in disk_embedding_caches:
+            disk_embedding_caches[key] = DiskEmbeddingCache(directory, model_name)
+        return disk_embedding_caches[key]
@@ -0,0 +1,349 @@
+# pybo/rag/evaluation.py
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from pybo import db
+from pybo.models import EvaluationLog
+
+from .metrics import log_evaluation_queue_event, log_stage_time
+from .models import get_llm
+
+# 평가 기준 설명 (reference 가 있을 때만 correctness 평가)
+EVAL_CRITERIA = {
+    "relevance": "답변이 질문과 관련이 있고 질문에 실제로 답하고 있는가?",
+    "conciseness": "답변이 불필요한 내용 없이 간결한가?",
+    "correctness": "답변이 참고 정답(reference)과 비교하여 사실적으로 올바른가?"
+}
+
+# 여러 기준을 한 번의 LLM 호출로 평가하는 프롬프트 (답변 여러 개를 한 번에 평가할 수 있음)
+combined_eval_prompt = PromptTemplate(
+    input_variables=["criteria", "items"],
+    template="""
+        당신은 AI 답변을 채점하는 평가자입니다. 아래의 각 항목(item)을 주어진 기준에 따라 평가하세요.
+
+        ### 평가 기준
+        {criteria}
+
+        ### 평가 대상
+        {items}
+
+        ### 출력 형식
+        설명 없이 JSON 배열만 출력하세요. 항목마다 하나의 객체를 id 순서대로 작성하고,
+        각 기준은 reasoning(한두 문장의 평가 이유)과 score(충족하면 1, 아니면 0)를 가집니다.
+        평가 대상에 reference 가 없는 항목은 correctness 를 생략하세요.
+        [{{"id": 1, "relevance": {{"reasoning": "...", "score": 1}}, "conciseness": {{"reasoning": "...", "score": 0}}}}]
+    """
+)
+
+# 평가 요청 대기열과 워커 스레드 (애플리케이션 최초 평가 요청 시 시작)
+evaluation_queue = None
+evaluation_workers = []
+evaluation_workers_lock = threading.Lock()
+
+
+# 평가 대상 목록을 프롬프트 문자열로 만드는 함수
+def _format_eval_items(items: list) -> str:
+    blocks = []
+    for index, item in enumerate(items, start=1):
+        block = f"[item id={index}]\n- question: {item['question']}\n- prediction: {item['prediction']}"
+        if item.get("reference"):
+            block += f"\n- reference: {item['reference']}"
+        blocks.append(block)
+    return "\n\n".join(blocks)
+
+# 기준별 결과를 기존 LangChain 평가기와 같은 형태({"reasoning", "value", "score"})로 정리하는 함수
+def _normalize_criterion_result(criterion: str, result) -> dict:
+    if isinstance(result, dict):
+        reasoning = str(result.get("reasoning", "")).strip()
+        score = result.get("score")
+    else:
+        reasoning, score = "", result
+    try:
+        score = 1 if int(float(score)) >= 1 else 0
+    except (TypeError, ValueError):
+        score = {"y": 1, "yes": 1, "correct": 1, "n": 0, "no": 0, "incorrect": 0}.get(str(score).strip().lower())
+    if criterion == "correctness":
+        value = {1: "CORRECT", 0: "INCORRECT"}.get(score)
+    else:
+        value = {1: "Y", 0: "N"}.get(score)
+    return {"reasoning": reasoning, "value": value, "score": score}
+
+# 기준별 점수를 정규식으로 찾는 파싱 대체 함수 (JSON 파싱 실패 시 사용)
+def _parse_scores_by_regex(text: str, criteria: list) -> dict:
+    results = {}
+    for criterion in criteria:
+        match = re.search(rf'{criterion}.{{0,300}}?score"?\s*[:=]\s*"?([01])', text, re.IGNORECASE | re.DOTALL) \
+            or re.search(rf'{criterion}"?\s*[:=-]\s*"?([01]|Y|N)\b', text, re.IGNORECASE)
+        if match:
+            results[criterion] = {"reasoning": "", "score": match.group(1)}
+    return results
+
+# LLM 출력에서 항목별 평가 결과를 파싱하는 함수
+def parse_combined_evaluation(text: str, items: list) -> list:
+    """
+    LLM 출력을 항목별 평가 결과 목록으로 변환합니다.
+    1) JSON 배열/객체 파싱 -> 2) 기준별 정규식 파싱(항목이 하나일 때) -> 3) 해석 불가 결과 순으로 시도합니다.
+    """
+    cleaned = re.sub(r"```(?:json)?", "", text).strip()
+    parsed = None
+    for pattern in (r"\[.*\]", r"\{.*\}"):
+        match = re.search(pattern, cleaned, re.DOTALL)
+        if not match:
+            continue
+        try:
+            parsed = json.loads(match.group(0))
+            break
+        except json.JSONDecodeError:
+            continue
+    if isinstance(parsed, dict):
+        parsed = [parsed]
+
+    parsed_by_id = {}
+    if isinstance(parsed, list):
+        for position, entry in enumerate(parsed, start=1):
+            if isinstance(entry, dict):
+                try:
+                    parsed_by_id[int(entry.get("id", position))] = entry
+                except (TypeError, ValueError):
+                    parsed_by_id[position] = entry
+
+    results = []
+    for index, item in enumerate(items, start=1):
+        criteria = ["relevance", "conciseness"] + (["correctness"] if item.get("reference") else [])
+        entry = parsed_by_id.get(index)
+        if entry is None and len(items) == 1:
+            entry = _parse_scores_by_regex(cleaned, criteria)
+        entry = entry or {}
+        eval_results = {}
+        for criterion in criteria:
+            if criterion in entry:
+                eval_results[criterion] = _normalize_criterion_result(criterion, entry[criterion])
+            else:
+                eval_results[criterion] = {"reasoning": f"평가 결과를 해석할 수 없습니다: {text[:200]}", "value": None, "score": None}
+        results.append(eval_results)
+    return results
+
+# 여러 답변을 한 번의 LLM 호출로 평가하는 함수
+def evaluate_combined(items: list) -> list:
+    """
+    items([{"question", "prediction", "reference"}])의 모든 기준(relevance, conciseness, correctness)을
+    한 번의 LLM 호출로 평가하여, 항목별 {기준: {"reasoning", "value", "score"}} 목록을 반환합니다.
+    """
+    has_reference = any(item.get("reference") for item in items)
+    criteria_text = "\n".join(
+        f"- {name}: {description}" for name, description in EVAL_CRITERIA.items()
+        if name != "correctness" or has_reference
+    )
+    # 사용자 요청보다 낮은 우선순위로 실행되는 평가용 LLM, 일관된 채점을 위해 낮은 temperature 사용
+    chain = combined_eval_prompt | get_llm(temperature=0.0, background=True) | StrOutputParser()
+    output = chain.invoke({"criteria": criteria_text, "items": _format_eval_items(items)})
+    return parse_combined_evaluation(output, items)
+
+# 평가 로그 타입 정규화 (기본값: normal_rag)
+def _normalize_log_type(log_type: str) -> str:
+    return 'sentiment_rag' if log_type == 'sentiment_rag' else 'normal_rag'
+
+# 마지막으로 오래된 평가 로그를 정리한 시각 (정리는 EVAL_LOG_PRUNE_INTERVAL 초에 한 번만 수행)
+last_prune_time = 0.0
+EVAL_LOG_PRUNE_INTERVAL = 3600
+
+# 보존 기간이 지난 평가 로그를 정리하는 함수
+def prune_evaluation_logs(retention_days: int = None, force: bool = False) -> int:
+    """retention_days 일보다 오래된 평가 로그를 삭제하고 삭제된 개수를 반환합니다. 0 이하이면 정리하지 않습니다."""
+    global last_prune_time
+    if retention_days is None:
+        retention_days = current_app.config.get('EVAL_LOG_RETENTION_DAYS', 0)
+    if not retention_days or retention_days <= 0:
+        return 0
+    if not force and time.time() - last_prune_time < EVAL_LOG_PRUNE_INTERVAL:
+        return 0
+    last_prune_time = time.time()
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    deleted = EvaluationLog.query.filter(EvaluationLog.create_date < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        print(f"[-RAG-] (Evaluation Log) Pruned {deleted} log(s) older than {retention_days} day(s).")
+    return deleted
+
+# 평가 결과를 로그 테이블에 저장하는 함수
+def save_evaluation_log(question: str, prediction: str, eval_results: dict, reference: str = None,
+                        log_type: str = 'normal_rag', full_data: dict = None) -> int:
+    """평가 결과를 evaluation_log 테이블에 한 행으로 추가하고, 저장된 로그 ID를 반환합니다."""
+    log_type = _normalize_log_type(log_type)
+    log = EvaluationLog(
+        log_type=log_type,
+        create_date=datetime.now(),
+        question=question,
+        prediction=prediction,
+        reference=reference,
+        evaluation=eval_results,
+        # sentiment_rag 타입일 경우, 전체 데이터 추가
+        extra_data=full_data if log_type == 'sentiment_rag' and full_data else None
+    )
+    db.session.add(log)
+    db.session.commit()
+    return log.id
+
+# 기존 JSON 파일 로그를 로그 테이블로 가져오는 함수
+def import_json_evaluation_logs(logs_root: str) -> dict:
+    """
+    logs_root/<log_type>/*.json 파일을 evaluation_log 테이블로 가져옵니다.
+    이미 가져온 파일(source_file 기준)은 건너뛰므로 여러 번 실행해도 안전합니다.
+    """
+    base_keys = {"timestamp", "question", "prediction", "reference", "evaluation"}
+    imported, skipped, failed = 0, 0, 0
+    for log_type in ('normal_rag', 'sentiment_rag'):
+        logs_dir = os.path.join(logs_root, log_type)
+        if not os.path.isdir(logs_dir):
+            continue
+        existing = {row.source_file for row in
+                    EvaluationLog.query.with_entities(EvaluationLog.source_file)
+                    .filter(EvaluationLog.source_file.isnot(None)).all()}
+        for filename in sorted(os.listdir(logs_dir)):
+            if not filename.endswith('.json'):
+                continue
+            source_file = f"{log_type}/{filename}"
+            if source_file in existing:
+                skipped += 1
+                continue
+            try:
+                with open(os.path.join(logs_dir, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                extra_data = {key: value for key, value in data.items() if key not in base_keys}
+                db.session.add(EvaluationLog(
+                    log_type=log_type,
+                    create_date=datetime.fromisoformat(data["timestamp"]),
+                    question=data.get("question", ""),
+                    prediction=data.get("prediction", ""),
+                    reference=data.get("reference"),
+                    evaluation=data.get("evaluation", {}),
+                    extra_data=extra_data or None,
+                    source_file=source_file
+                ))
+                imported += 1
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
+                print(f"[-RAG-] (Evaluation Log) Skipping {source_file}: {e}")
+                failed += 1
+        db.session.commit()
+    return {"imported": imported, "skipped": skipped, "failed": failed}
+
+# 평가 공통 함수
+def run_and_log_evaluation(question: str, prediction: str, reference: str = None, log_type: str = 'normal_rag', full_data: dict = None):
+    """답변을 평가하고, 결과를 평가 로그 테이블에 저장합니다."""
+    results = run_and_log_evaluation_batch([{
+        "question": question, "prediction": prediction, "reference": reference,
+        "log_type": log_type, "full_data": full_data
+    }])
+    return results[0]
+
+# 여러 답변을 한 번에 평가하고 각각 로그로 저장하는 함수
+def run_and_log_evaluation_batch(items: list) -> list:
+    """items 를 한 번의 LLM 호출로 평가하고, 항목별 로그를 저장합니다. 실패한 항목의 결과는 None 입니다."""
+    print(f"--- Starting combined evaluation for {len(items)} item(s) ---")
+    try:
+        all_results = evaluate_combined(items)
+    except Exception as e:
+        print(f"--- Evaluation Error ---: {e}")
+        return [None] * len(items)
+
+    saved_results = []
+    for item, eval_results in zip(items, all_results):
+        try:
+            log_id = save_evaluation_log(
+                question=item["question"], prediction=item["prediction"], eval_results=eval_results,
+                reference=item.get("reference"), log_type=item.get("log_type", "normal_rag"),
+                full_data=item.get("full_data")
+            )
+            print(f"--- Evaluation successful. Log saved (id={log_id}) ---")
+            saved_results.append(eval_results)
+        except Exception as e:
+            db.session.rollback()
+            print(f"--- Evaluation log error ---: {e}")
+            saved_results.append(None)
+    try:
+        prune_evaluation_logs()
+    except Exception as e:
+        db.session.rollback()
+        print(f"--- Evaluation log prune error ---: {e}")
+    return saved_results
+
+# 대기열에서 평가 요청을 최대 batch_size 개까지 꺼내는 함수
+def _take_evaluation_batch(batch_size: int) -> list:
+    """첫 요청은 올 때까지 기다리고, 이미 쌓여 있는 요청은 batch_size 개까지 함께 꺼냅니다."""
+    batch = [evaluation_queue.get()]
+    while len(batch) < batch_size:
+        try:
+            batch.append(evaluation_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+# 평가 워커 스레드 함수
+def evaluation_worker(app):
+    """대기열에서 평가 요청을 꺼내 (여러 개가 쌓여 있으면 묶어서) 평가 및 로그 저장을 실행합니다."""
+    batch_size = max(1, app.config.get("EVAL_BATCH_SIZE", 4))
+    while True:
+        batch = _take_evaluation_batch(batch_size)
+        try:
+            # 요청이 대기열에 들어간 뒤 평가를 시작하기까지 걸린 시간(지연) 기록
+            now = time.time()
+            for enqueued_at, item in batch:
+                log_stage_time("eval_queue_lag", now - enqueued_at, source=item.get("log_type", "normal_rag"))
+            with app.app_context():
+                results = run_and_log_evaluation_batch([item for _, item in batch])
+            for result in results:
+                log_evaluation_queue_event("completed" if result is not None else "failed", evaluation_queue.qsize())
+        except Exception as e:
+            print(f"--- Evaluation worker error: {e} ---")
+            for _ in batch:
+                log_evaluation_queue_event("failed", evaluation_queue.qsize())
+        finally:
+            for _ in batch:
+                evaluation_queue.task_done()
+
+# 평가 워커를 시작하는 함수
+def _ensure_evaluation_workers(app):
+    """평가 대기열과 고정 개수의 워커 스레드를 한 번만 생성합니다."""
+    global evaluation_queue
+    with evaluation_workers_lock:
+        if evaluation_queue is not None:
+            return
+        evaluation_queue = queue.Queue(maxsize=app.config.get("EVAL_QUEUE_MAX_SIZE", 100))
+        for i in range(app.config.get("EVAL_WORKERS", 1)):
+            worker = threading.Thread(target=evaluation_worker, args=(app,), name=f"rag-eval-{i}", daemon=True)
+            worker.start()
+            evaluation_workers.append(worker)
+        print(f"[-RAG-] Started {len(evaluation_workers)} evaluation worker(s).")
+
+# 백그라운드 평가 요청 함수 (로그 경로 통일, 2025-09-15 jylee)
+def start_evaluation_in_background(question: str, prediction: str, log_type: str = 'normal_rag', full_data: dict = None):
+    """
+    평가 요청을 대기열에 넣습니다. 샘플링 비율(EVAL_SAMPLE_RATE)에 따라 일부만 평가하며,
+    대기열이 가득 차면 사용자 요청에 영향을 주지 않도록 평가 요청을 버립니다.
+    """
+    app = current_app._get_current_object()
+    _ensure_evaluation_workers(app)
+
+    if random.random() >= app.config.get("EVAL_SAMPLE_RATE", 1.0):
+        log_evaluation_queue_event("sampled_out", evaluation_queue.qsize())
+        return False
+
+    item = {"question": question, "prediction": prediction, "log_type": log_type, "full_data": full_data}
+    try:
+        evaluation_queue.put_nowait((time.time(), item))
+    except queue.Full:
+        print(f"--- Evaluation queue is full. Dropping evaluation for: '{question[:50]}...' ---")
+        log_evaluation_queue_event("dropped", evaluation_queue.qsize())
+        return False
+    log_evaluation_queue_event("enqueued", evaluation_queue.qsize())
+    return True
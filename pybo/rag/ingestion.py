@@ -0,0 +1,156 @@
+# pybo/rag/ingestion.py
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+# 인덱싱 단계 (진행률 표시 순서)
+INGESTION_STAGES = ("parse", "split", "embed", "write")
+
+# 인덱싱 작업 목록: {작업 ID: 작업 상태 dict}
+ingestion_jobs = {}
+ingestion_jobs_lock = threading.Lock()
+
+# 인덱싱 대기/진행 중인 파일 내용 해시: {파일 해시: 원본 파일명} (같은 파일의 동시 업로드 방지)
+pending_file_hashes = {}
+pending_file_hashes_lock = threading.Lock()
+
+# 인덱싱 작업을 실행하는 공유 스레드 풀 (첫 작업 제출 시 생성)
+ingestion_executor = None
+ingestion_executor_lock = threading.Lock()
+
+
+def _get_ingestion_executor(max_workers: int) -> ThreadPoolExecutor:
+    global ingestion_executor
+    with ingestion_executor_lock:
+        if ingestion_executor is None:
+            ingestion_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        return ingestion_executor
+
+
+def _new_job(filename: str) -> dict:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "filename": filename,
+        "status": "queued",  # queued -> running -> done | failed
+        "stage": None,
+        "progress": {stage: {"done": 0, "total": None} for stage in INGESTION_STAGES},
+        "chunk_count": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _update_job(job_id: str, **fields):
+    with ingestion_jobs_lock:
+        job = ingestion_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+            job["updated_at"] = time.time()
+
+
+def _prune_finished_jobs(ttl: float):
+    """완료/실패 후 ttl 초가 지난 작업을 목록에서 제거합니다."""
+    now = time.time()
+    with ingestion_jobs_lock:
+        for job_id in [job_id for job_id, job in ingestion_jobs.items()
+                       if job["status"] in ("done", "failed") and now - job["updated_at"] > ttl]:
+            del ingestion_jobs[job_id]
+
+
+# 인덱싱 함수에 넘길 진행률 콜백을 만드는 함수
+def make_progress_callback(job_id: str):
+    """progress(stage, done, total) 형태의 콜백을 반환합니다. total 을 모르면 None 으로 전달합니다."""
+    def progress(stage: str, done: int, total: int = None):
+        with ingestion_jobs_lock:
+            job = ingestion_jobs.get(job_id)
+            if job is None:
+                return
+            job["stage"] = stage
+            job["progress"][stage] = {"done": done, "total": total}
+            job["updated_at"] = time.time()
+    return progress
+
+
+# 파일 내용 해시를 인덱싱 중으로 예약하는 함수
+def reserve_file_hash(file_hash: str, filename: str):
+    """
+    예약에 성공하면 None, 같은 해시의 파일이 이미 인덱싱 대기/진행 중이면 그 파일명을 반환합니다.
+    예약은 submit_ingestion_job(file_hash=...) 으로 넘긴 작업이 끝날 때 해제되며, 작업을 등록하지 못하면
+    release_file_hash() 로 직접 해제해야 합니다.
+    """
+    with pending_file_hashes_lock:
+        if file_hash in pending_file_hashes:
+            return pending_file_hashes[file_hash]
+        pending_file_hashes[file_hash] = filename
+        return None
+
+
+def release_file_hash(file_hash: str):
+    with pending_file_hashes_lock:
+        pending_file_hashes.pop(file_hash, None)
+
+
+def _run_job(app, job_id: str, index_func, filepath: str, file_hash: str = None):
+    with app.app_context():
+        _update_job(job_id, status="running")
+        try:
+            chunk_count = index_func(filepath, progress=make_progress_callback(job_id))
+            _update_job(job_id, status="done", stage=None, chunk_count=chunk_count)
+            print(f"[-RAG-] (Ingestion) Job {job_id} finished: {chunk_count} chunks from {filepath}")
+        except Exception as e:
+            _update_job(job_id, status="failed", error=str(e))
+            print(f"[-RAG-] (Ingestion) Job {job_id} failed for {filepath}: {e}")
+        finally:
+            if file_hash:
+                release_file_hash(file_hash)
+
+
+# 인덱싱 작업을 작업 풀에 등록하는 함수
+def submit_ingestion_job(filename: str, index_func, filepath: str, file_hash: str = None) -> str:
+    """
+    index_func(filepath, progress=콜백) 을 백그라운드 작업 풀에서 실행하도록 등록하고 작업 ID를 반환합니다.
+    작업 상태는 get_job() / get_latest_file_job() 으로 조회합니다.
+    file_hash 를 넘기면 reserve_file_hash() 로 예약한 해시를 작업이 끝날 때 해제합니다.
+    """
+    config = current_app.config
+    _prune_finished_jobs(config.get("INGESTION_JOB_TTL", 3600))
+
+    job = _new_job(filename)
+    with ingestion_jobs_lock:
+        ingestion_jobs[job["id"]] = job
+
+    executor = _get_ingestion_executor(config.get("INGESTION_WORKERS", 2))
+    executor.submit(_run_job, current_app._get_current_object(), job["id"], index_func, filepath, file_hash)
+    print(f"[-RAG-] (Ingestion) Queued job {job['id']} for {filename}")
+    return job["id"]
+
+
+def get_job(job_id: str):
+    """작업 상태의 사본을 반환합니다. 없는 작업이면 None을 반환합니다."""
+    with ingestion_jobs_lock:
+        job = ingestion_jobs.get(job_id)
+        if job is None:
+            return None
+        return {**job, "progress": {stage: dict(value) for stage, value in job["progress"].items()}}
+
+
+def list_jobs(active_only: bool = False) -> list:
+    """작업 목록을 최신순으로 반환합니다. active_only=True 이면 대기/실행 중인 작업만 반환합니다."""
+    with ingestion_jobs_lock:
+        job_ids = [job_id for job_id, job in ingestion_jobs.items()
+                   if not active_only or job["status"] in ("queued", "running")]
+    jobs = [job for job in (get_job(job_id) for job_id in job_ids) if job is not None]
+    return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+
+def get_latest_file_job(filename: str):
+    """파일의 가장 최근 인덱싱 작업 상태의 사본을 반환합니다. 작업이 없으면 None을 반환합니다."""
+    with ingestion_jobs_lock:
+        jobs = [job for job in ingestion_jobs.values() if job["filename"] == filename]
+        latest_id = max(jobs, key=lambda job: job["created_at"])["id"] if jobs else None
+    return get_job(latest_id) if latest_id else None
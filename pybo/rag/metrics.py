@@ -1,17 +1,388 @@
 # pybo/rag/metrics.py
-from collections import deque
-from datetime import datetime
+import atexit
+import bisect
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
 
-# 챗봇 응답 시간과 감정 분석 결과를 저장할 deque (최대 200개)
-# 실제 환경에서는 데이터베이스 사용을 권장
-chatbot_response_times = deque(maxlen=200)
+from flask import g, request
+
+from pybo import db
+from pybo.models import MetricHistogram
+
+# 응답 시간 히스토그램 버킷 경계(초): 5ms ~ 약 280초를 1.2배 간격의 로그 스케일로 나눔
+# 원본 값 대신 버킷별 개수만 저장하므로 저장 공간이 일정하고, 여러 워커의 값을 단순 합산으로 병합할 수 있다
+HISTOGRAM_BOUNDS = [round(0.005 * 1.2 ** i, 6) for i in range(60)]
+
+# 아직 DB에 저장하지 않은 1분 단위 히스토그램: {(분 시작 시각, source, stage): 히스토그램}
+pending_histograms = {}
+pending_histograms_lock = threading.Lock()
+
+# 주기적 저장 스레드 상태
+metrics_flush_thread = None
+metrics_flush_lock = threading.Lock()
+last_metrics_prune_time = 0.0
+
+def _new_histogram() -> dict:
+    return {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * (len(HISTOGRAM_BOUNDS) + 1)}
+
+def _merge_histogram(target: dict, count: int, total: float, max_value: float, buckets: list):
+    target["count"] += count
+    target["total"] += total
+    target["max"] = max(target["max"], max_value)
+    target["buckets"] = [a + b for a, b in zip(target["buckets"], buckets)]
+
+def _worker_id() -> str:
+    """워커 프로세스 식별자 (fork 이후에도 프로세스마다 달라지도록 호출 시점의 PID 사용)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _record_duration(stage: str, duration: float, source: str):
+    """소요 시간을 현재 1분 구간의 히스토그램에 누적합니다."""
+    bucket_start = datetime.now().replace(second=0, microsecond=0)
+    index = bisect.bisect_left(HISTOGRAM_BOUNDS, duration)
+    with pending_histograms_lock:
+        histogram = pending_histograms.get((bucket_start, source, stage))
+        if histogram is None:
+            histogram = pending_histograms[(bucket_start, source, stage)] = _new_histogram()
+        histogram["count"] += 1
+        histogram["total"] += duration
+        histogram["max"] = max(histogram["max"], duration)
+        histogram["buckets"][index] += 1
+    observe_histogram("rag_stage_duration_seconds", duration, stage=stage, source=source)
 
 def log_chatbot_response_time(duration: float, source: str):
-    """챗봇 응답 시간을 기록합니다."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    chatbot_response_times.append({"timestamp": timestamp, "duration": duration, "source": source})
-    print(f"[-METRICS-] Logged response time from '{source}': {duration:.4f}s at {timestamp}")
-
-def get_chatbot_metrics():
-    """챗봇 응답 시간 데이터를 반환합니다."""
-    return chatbot_response_times
\ No newline at end of file
+    """챗봇 응답 시간을 기록합니다. (stage='total')"""
+    _record_duration("total", duration, source)
+    print(f"[-METRICS-] Logged response time from '{source}': {duration:.4f}s")
+
+def log_stage_time(stage: str, duration: float, source: str, skipped: bool = False):
+    """
+    파이프라인 단계별 소요 시간을 기록합니다. 단계를 건너뛴 경우 skipped=True 로 호출하며,
+    히스토그램에는 포함하지 않고 rag_stage_skipped_total 카운터만 증가시킵니다.
+    (건너뛴 비율 = skipped / (skipped + rag_stage_duration_seconds_count))
+    """
+    if skipped:
+        increment_counter("rag_stage_skipped_total", stage=stage, source=source)
+        print(f"[-METRICS-] Skipped stage '{stage}' for '{source}'")
+        return
+    _record_duration(stage, duration, source)
+    print(f"[-METRICS-] Logged stage '{stage}' for '{source}': {duration:.4f}s")
+
+# 누적된 히스토그램을 DB에 저장하는 함수 (앱 컨텍스트 필요)
+def flush_metrics() -> int:
+    """
+    이 프로세스에 쌓인 히스토그램을 metric_histogram 테이블에 합산 저장하고, 저장한 행 수를 반환합니다.
+    각 워커는 자신의 행(worker 컬럼)만 갱신하므로 여러 프로세스가 동시에 저장해도 값이 유실되지 않습니다.
+    """
+    with pending_histograms_lock:
+        pending = dict(pending_histograms)
+        pending_histograms.clear()
+    if not pending:
+        return 0
+
+    worker = _worker_id()
+    try:
+        for (bucket_start, source, stage), histogram in pending.items():
+            row = MetricHistogram.query.filter_by(
+                bucket_start=bucket_start, worker=worker, source=source, stage=stage
+            ).first()
+            if row is None:
+                row = MetricHistogram(
+                    bucket_start=bucket_start, worker=worker, source=source, stage=stage,
+                    count=0, total=0.0, max_value=0.0, bucket_counts=[0] * (len(HISTOGRAM_BOUNDS) + 1)
+                )
+                db.session.add(row)
+            merged = {"count": row.count, "total": row.total, "max": row.max_value, "buckets": list(row.bucket_counts)}
+            _merge_histogram(merged, histogram["count"], histogram["total"], histogram["max"], histogram["buckets"])
+            row.count, row.total, row.max_value, row.bucket_counts = merged["count"], merged["total"], merged["max"], merged["buckets"]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # 저장에 실패한 값은 다음 저장 때 다시 시도
+        with pending_histograms_lock:
+            for key, histogram in pending.items():
+                target = pending_histograms.setdefault(key, _new_histogram())
+                _merge_histogram(target, histogram["count"], histogram["total"], histogram["max"], histogram["buckets"])
+        print(f"[-METRICS-] Failed to flush metrics: {e}")
+        return 0
+    return len(pending)
+
+# 보존 기간이 지난 히스토그램을 정리하는 함수 (앱 컨텍스트 필요)
+def prune_metrics(retention_days: int) -> int:
+    """retention_days 일보다 오래된 히스토그램 행을 삭제하고 삭제된 개수를 반환합니다."""
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    deleted = MetricHistogram.query.filter(MetricHistogram.bucket_start < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def metrics_flush_worker(app):
+    """METRICS_FLUSH_INTERVAL 초마다 히스토그램을 저장하고, 한 시간에 한 번 오래된 행을 정리합니다."""
+    global last_metrics_prune_time
+    interval = app.config.get("METRICS_FLUSH_INTERVAL", 10)
+    retention_days = app.config.get("METRICS_RETENTION_DAYS", 7)
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            flush_metrics()
+            if retention_days > 0 and time.time() - last_metrics_prune_time >= 3600:
+                last_metrics_prune_time = time.time()
+                try:
+                    prune_metrics(retention_days)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[-METRICS-] Failed to prune metrics: {e}")
+
+def _start_metrics_flush(app):
+    """히스토그램 주기적 저장 스레드를 시작하고 종료 시 남은 값을 저장하도록 등록합니다. (프로세스당 한 번)"""
+    global metrics_flush_thread
+    with metrics_flush_lock:
+        if metrics_flush_thread is not None:
+            return
+        metrics_flush_thread = threading.Thread(target=metrics_flush_worker, args=(app,), daemon=True)
+        metrics_flush_thread.start()
+
+    def flush_on_exit():
+        with app.app_context():
+            flush_metrics()
+    atexit.register(flush_on_exit)
+
+def init_app(app):
+    """
+    요청 수/지연 시간 기록 훅을 등록합니다. 히스토그램 주기적 저장 스레드와 종료 시 저장은 첫 요청에서 시작하므로,
+    요청을 처리하지 않는 CLI 명령(flask db upgrade 등)에서는 실행되지 않습니다.
+    요청 지연 시간은 응답 헤더를 보낼 때까지의 시간입니다. (SSE 스트리밍 본문 전송 시간은 포함되지 않음)
+    """
+    @app.before_request
+    def start_request_timer():
+        g.request_start_time = time.time()
+        if metrics_flush_thread is None:
+            _start_metrics_flush(app)
+
+    @app.after_request
+    def record_request_metrics(response):
+        start_time = g.pop("request_start_time", None)
+        if start_time is not None:
+            endpoint = request.endpoint or "unmatched"
+            blueprint = request.blueprint or ""
+            increment_counter("http_requests_total", endpoint=endpoint, blueprint=blueprint,
+                              method=request.method, status=str(response.status_code))
+            observe_histogram("http_request_duration_seconds", time.time() - start_time,
+                              endpoint=endpoint, blueprint=blueprint, method=request.method)
+        return response
+
+def _percentile(histogram: dict, q: float) -> float:
+    """히스토그램에서 q 분위수(0.0 ~ 1.0)를 버킷 내 선형 보간으로 추정합니다."""
+    target = q * histogram["count"]
+    cumulative = 0
+    for index, bucket_count in enumerate(histogram["buckets"]):
+        if bucket_count and cumulative + bucket_count >= target:
+            lower = HISTOGRAM_BOUNDS[index - 1] if index > 0 else 0.0
+            upper = HISTOGRAM_BOUNDS[index] if index < len(HISTOGRAM_BOUNDS) else histogram["max"]
+            value = lower + (upper - lower) * (target - cumulative) / bucket_count
+            return min(value, histogram["max"])
+        cumulative += bucket_count
+    return histogram["max"]
+
+def _summarize(histogram: dict) -> dict:
+    count = histogram["count"]
+    return {
+        "count": count,
+        "avg": histogram["total"] / count if count else 0.0,
+        "p50": _percentile(histogram, 0.50),
+        "p95": _percentile(histogram, 0.95),
+        "p99": _percentile(histogram, 0.99),
+        "max": histogram["max"],
+    }
+
+def _load_histograms(window_seconds: int, stage: str = None):
+    """현재 프로세스의 값을 먼저 저장한 뒤, 최근 window_seconds 초 동안의 모든 워커 히스토그램 행을 조회합니다."""
+    flush_metrics()
+    since = datetime.now().replace(second=0, microsecond=0) - timedelta(seconds=window_seconds)
+    query = MetricHistogram.query.filter(MetricHistogram.bucket_start >= since)
+    if stage is not None:
+        query = query.filter(MetricHistogram.stage == stage)
+    return query.all()
+
+# 구간별 백분위 요약 (앱 컨텍스트 필요)
+def get_latency_summary(window_seconds: int = 3600) -> dict:
+    """최근 window_seconds 초의 소요 시간 요약을 {source: {stage: {count, avg, p50, p95, p99, max}}} 형태로 반환합니다."""
+    merged = {}
+    for row in _load_histograms(window_seconds):
+        histogram = merged.setdefault((row.source, row.stage), _new_histogram())
+        _merge_histogram(histogram, row.count, row.total, row.max_value, row.bucket_counts)
+
+    summary = {}
+    for (source, stage), histogram in sorted(merged.items()):
+        summary.setdefault(source, {})[stage] = _summarize(histogram)
+    return summary
+
+# 시간대별 백분위 추이 (앱 컨텍스트 필요)
+def get_latency_series(stage: str = "total", window_seconds: int = 21600, step_seconds: int = 300) -> dict:
+    """
+    최근 window_seconds 초를 step_seconds 간격으로 나누어 source별 p50/p95 추이를 반환합니다.
+    반환값: {"labels": [시각 문자열], "series": {source: {"p50": [...], "p95": [...]}}} (값이 없는 구간은 None)
+    """
+    step_seconds = max(60, step_seconds)
+    merged = {}
+    for row in _load_histograms(window_seconds, stage=stage):
+        slot = int(row.bucket_start.timestamp()) // step_seconds * step_seconds
+        histogram = merged.setdefault((slot, row.source), _new_histogram())
+        _merge_histogram(histogram, row.count, row.total, row.max_value, row.bucket_counts)
+
+    slots = sorted({slot for slot, _ in merged})
+    sources = sorted({source for _, source in merged})
+    series = {source: {"p50": [], "p95": []} for source in sources}
+    for slot in slots:
+        for source in sources:
+            histogram = merged.get((slot, source))
+            series[source]["p50"].append(_percentile(histogram, 0.50) if histogram else None)
+            series[source]["p95"].append(_percentile(histogram, 0.95) if histogram else None)
+    labels = [datetime.fromtimestamp(slot).strftime("%Y-%m-%d %H:%M") for slot in slots]
+    return {"labels": labels, "series": series}
+
+# 캐시 적중/미스 카운터 (캐시 이름별: query_embedding, answer 등)
+cache_stats = {}
+cache_stats_lock = threading.Lock()
+
+def log_cache_hit(cache_name: str):
+    """캐시 적중을 기록합니다."""
+    with cache_stats_lock:
+        cache_stats.setdefault(cache_name, {"hits": 0, "misses": 0})["hits"] += 1
+
+def log_cache_miss(cache_name: str):
+    """캐시 미스를 기록합니다."""
+    with cache_stats_lock:
+        cache_stats.setdefault(cache_name, {"hits": 0, "misses": 0})["misses"] += 1
+
+def get_cache_stats():
+    """캐시 이름별 적중/미스 횟수와 적중률을 반환합니다."""
+    with cache_stats_lock:
+        snapshot = {name: dict(stats) for name, stats in cache_stats.items()}
+    for stats in snapshot.values():
+        total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+    return snapshot
+
+# 평가 큐 상태 (이벤트별 누적 횟수 + 현재 대기열 길이)
+evaluation_queue_stats = {"enqueued": 0, "dropped": 0, "sampled_out": 0, "completed": 0, "failed": 0, "depth": 0}
+evaluation_queue_lock = threading.Lock()
+
+def log_evaluation_queue_event(event: str, depth: int):
+    """평가 큐 이벤트(enqueued, dropped, sampled_out, completed, failed)와 현재 대기열 길이를 기록합니다."""
+    with evaluation_queue_lock:
+        evaluation_queue_stats[event] = evaluation_queue_stats.get(event, 0) + 1
+        evaluation_queue_stats["depth"] = depth
+
+def get_evaluation_queue_stats():
+    """평가 큐 상태를 반환합니다."""
+    with evaluation_queue_lock:
+        return dict(evaluation_queue_stats)
+
+# Prometheus 형식 지표 (프로세스 단위 누적값, /metrics 에서 텍스트 형식으로 노출)
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PROMETHEUS_HELP = {
+    "http_requests_total": "Total HTTP requests by endpoint, method and status.",
+    "http_request_duration_seconds": "HTTP request latency until response headers are sent.",
+    "rag_stage_duration_seconds": "RAG pipeline stage duration (rewrite, retrieve, generate, total, embed_*, chroma_query, llm_*).",
+    "rag_embedded_texts_total": "Total texts embedded by embed_documents.",
+    "rag_stage_skipped_total": "RAG pipeline stages skipped (e.g. query rewrite on the first turn).",
+    "rag_query_embedding_batches_total": "Query embedding micro-batches executed.",
+    "rag_query_embedding_batched_requests_total": "Query embedding requests served by micro-batches.",
+    "rag_query_embedding_batch_fallbacks_total": "Query embeddings computed directly after the micro-batch wait timed out.",
+}
+prometheus_counters = {}  # {(지표 이름, 라벨 튜플): 값}
+prometheus_histograms = {}  # {(지표 이름, 라벨 튜플): {"buckets", "sum", "count"}}
+prometheus_lock = threading.Lock()
+
+def increment_counter(name: str, amount: float = 1.0, **labels):
+    """Prometheus 카운터를 amount 만큼 증가시킵니다."""
+    key = (name, tuple(sorted(labels.items())))
+    with prometheus_lock:
+        prometheus_counters[key] = prometheus_counters.get(key, 0.0) + amount
+
+def observe_histogram(name: str, value: float, **labels):
+    """Prometheus 히스토그램에 값을 기록합니다. (버킷: PROMETHEUS_BUCKETS)"""
+    key = (name, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(PROMETHEUS_BUCKETS, value)
+    with prometheus_lock:
+        histogram = prometheus_histograms.get(key)
+        if histogram is None:
+            histogram = prometheus_histograms[key] = {"buckets": [0] * len(PROMETHEUS_BUCKETS), "sum": 0.0, "count": 0}
+        if index < len(PROMETHEUS_BUCKETS):
+            histogram["buckets"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value) -> str:
+    return repr(float(value))
+
+def render_prometheus_metrics(gauges: list = None) -> str:
+    """
+    누적된 카운터/히스토그램과 캐시·평가 큐 상태를 Prometheus 텍스트 형식으로 반환합니다.
+    gauges: 추가로 노출할 게이지 목록 [(이름, 설명, 라벨 dict, 값), ...] (LLM 동시 실행 수 등)
+    """
+    with prometheus_lock:
+        counters = dict(prometheus_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                      for key, h in prometheus_histograms.items()}
+
+    # 캐시 적중/미스와 평가 큐 이벤트도 카운터로 노출
+    for cache_name, stats in get_cache_stats().items():
+        counters[("rag_cache_hits_total", (("cache", cache_name),))] = stats["hits"]
+        counters[("rag_cache_misses_total", (("cache", cache_name),))] = stats["misses"]
+    queue_stats = get_evaluation_queue_stats()
+    for event, count in queue_stats.items():
+        if event != "depth":
+            counters[("rag_evaluation_queue_events_total", (("event", event),))] = count
+
+    all_gauges = [("rag_evaluation_queue_depth", "Current evaluation queue depth.", {}, queue_stats.get("depth", 0))]
+    for cache_name, stats in get_cache_stats().items():
+        all_gauges.append(("rag_cache_hit_ratio", "Cache hit ratio by cache name.", {"cache": cache_name}, stats["hit_ratio"]))
+    all_gauges.extend(gauges or [])
+
+    help_texts = dict(PROMETHEUS_HELP)
+    help_texts.setdefault("rag_cache_hits_total", "Cache hits by cache name.")
+    help_texts.setdefault("rag_cache_misses_total", "Cache misses by cache name.")
+    help_texts.setdefault("rag_evaluation_queue_events_total", "Evaluation queue events (enqueued, dropped, completed, ...).")
+
+    lines = []
+    for metric_name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {metric_name} {help_texts.get(metric_name, metric_name)}")
+        lines.append(f"# TYPE {metric_name} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric_name:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for metric_name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {metric_name} {help_texts.get(metric_name, metric_name)}")
+        lines.append(f"# TYPE {metric_name} histogram")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != metric_name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(PROMETHEUS_BUCKETS, histogram["buckets"]):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    described = set()
+    for name, help_text, labels, value in all_gauges:
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
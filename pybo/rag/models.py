@@ -1,18 +1,243 @@
 # pybo/rag/models.py
+import json
 import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Iterator, List, Optional
+
+import requests
 import torch
 from flask import current_app
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
+from pydantic import Field
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from .embedding_cache import get_disk_embedding_cache, text_hash
+from .metrics import increment_counter, log_cache_hit, log_cache_miss, log_stage_time
+from .onnx_embeddings import ONNX_MODEL_FILES, OnnxSentenceEmbeddings, get_onnx_model_path
+
 # 전역 모델 변수
 embedding_model = None
 llm = None
+llm_client = None
+llm_instances = {}  # {(temperature, background): PooledOllama}
+llm_instances_lock = threading.Lock()
 
 # .env 파일 로드
 load_dotenv()
 
+# 질문 텍스트 정규화 함수
+def normalize_query(text: str) -> str:
+    """캐시 키로 사용하기 위해 유니코드 정규화(NFC) 후 앞뒤 공백을 제거하고 연속 공백을 하나로 줄입니다."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+# 모델 토크나이저 기준 텍스트별 토큰 수를 구하는 함수
+def token_lengths(model: Embeddings, texts: List[str]) -> List[int]:
+    """
+    모델이 실제로 처리하는 토큰 수(max_seq_length 에서 잘림)를 반환합니다.
+    HuggingFaceEmbeddings(SentenceTransformer) 와 OnnxSentenceEmbeddings 의 토크나이저를 사용하며, 찾지 못하면 글자 수를 사용합니다.
+    """
+    client = getattr(model, "_client", None)  # HuggingFaceEmbeddings 내부 SentenceTransformer
+    tokenizer = getattr(model, "tokenizer", None) or getattr(client, "tokenizer", None)
+    max_length = getattr(model, "max_seq_length", None) or getattr(client, "max_seq_length", None) or 512
+    if tokenizer is None:
+        return [min(len(text), max_length) for text in texts]
+    input_ids = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)["input_ids"]
+    return [len(ids) for ids in input_ids]
+
+# 토큰 예산 기준으로 임베딩 배치를 나누는 함수
+def plan_token_budget_batches(lengths: List[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """
+    텍스트를 토큰 수 순으로 정렬한 뒤, (배치 크기 x 배치 내 최대 토큰 수) 가 token_budget 이하가 되도록 묶은
+    인덱스 배치 목록을 반환합니다. SentenceTransformer.encode 도 호출 단위로 길이순 정렬하지만 배치 크기는 고정이므로,
+    짧은 청크는 큰 배치로, 긴 청크는 작은 배치로 묶어 배치당 계산량(패딩 포함 토큰 수)을 고르게 합니다.
+    (ONNX 백엔드는 내부에서 정렬하지 않으므로 정렬 효과도 함께 얻습니다.)
+    """
+    batches, batch = [], []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # 오름차순이므로 새로 넣는 항목이 배치의 최대 길이가 됨
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[i] > token_budget):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+# 동시에 들어온 질문 임베딩 요청을 모아 한 번에 계산하는 마이크로 배치 서비스
+class QueryEmbeddingBatcher:
+    """
+    여러 요청 스레드의 embed_query 호출을 작업 스레드 하나가 모아서 embed_documents 한 번으로 계산합니다.
+    첫 요청이 도착하면 최대 max_wait 초 동안(또는 max_batch_size 개가 찰 때까지) 다른 요청을 기다린 뒤 실행하므로,
+    배치 크기 1의 추론이 같은 CPU 코어를 두고 경쟁하지 않습니다. 같은 배치 안의 같은 질문은 한 번만 계산합니다.
+    작업 스레드는 첫 요청 시 시작되며, 종료된 경우 다음 요청에서 다시 시작합니다.
+    max_wait + timeout 초 안에 결과를 받지 못하면 요청 스레드에서 직접 계산합니다.
+    """
+
+    def __init__(self, base: Embeddings, max_batch_size: int = 16, max_wait: float = 0.005, timeout: float = 5.0):
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._pending = []  # [{"text", "event", "vector", "error"}, ...]
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def embed(self, text: str) -> List[float]:
+        request = {"text": text, "event": threading.Event(), "vector": None, "error": None}
+        with self._condition:
+            if self._worker is None or not self._worker.is_alive():
+                if self._worker is not None:
+                    print("[-RAG-] (Query Embedding Batcher) Worker thread stopped. Restarting.")
+                self._worker = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._condition.notify_all()
+
+        if not request["event"].wait(self.max_wait + self.timeout):
+            with self._condition:
+                if request in self._pending:
+                    self._pending.remove(request)
+            print(f"[-RAG-] (Query Embedding Batcher) No result within {self.max_wait + self.timeout:.3f}s. "
+                  f"Embedding directly.")
+            increment_counter("rag_query_embedding_batch_fallbacks_total")
+            return self.base.embed_query(text)
+        if request["error"] is not None:
+            raise request["error"]
+        if request["vector"] is None:
+            # 작업 스레드가 결과 없이 종료된 경우
+            return self.base.embed_query(text)
+        return request["vector"]
+
+    def _next_batch(self) -> list:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            # 첫 요청 도착 후 max_wait 초 동안 배치를 채움
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                texts = list(dict.fromkeys(request["text"] for request in batch))
+                vectors = dict(zip(texts, self.base.embed_documents(texts)))
+                for request in batch:
+                    request["vector"] = vectors[request["text"]]
+                increment_counter("rag_query_embedding_batches_total")
+                increment_counter("rag_query_embedding_batched_requests_total", len(batch))
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            finally:
+                # 어떤 경우에도 대기 중인 요청을 깨움 (작업 스레드가 종료되더라도)
+                for request in batch:
+                    request["event"].set()
+
+# 질문 임베딩을 LRU 방식으로 캐시하는 임베딩 래퍼
+class CachedQueryEmbeddings(Embeddings):
+    """
+    embed_query 결과를 정규화된 텍스트 기준으로 캐시합니다. (최대 max_size 개, ttl 초 유지)
+    embed_documents 는 document_cache(DiskEmbeddingCache)가 있으면 청크 텍스트 해시로 디스크 캐시를 먼저 조회하고,
+    캐시에 없는 텍스트만 원본 모델로 계산하여 캐시에 추가합니다.
+    token_budget 이 0보다 크면 문서 텍스트를 길이별로 묶어 토큰 예산 단위 배치로 계산한 뒤 원래 순서로 되돌립니다.
+    query_batcher(QueryEmbeddingBatcher)가 있으면 캐시에 없는 질문은 다른 요청과 묶어서 계산합니다.
+    """
+
+    def __init__(self, base: Embeddings, max_size: int = 1024, ttl: float = 3600, document_cache=None,
+                 token_budget: int = 0, max_batch_size: int = 64, query_batcher: QueryEmbeddingBatcher = None):
+        self.base = base
+        self.max_size = max_size
+        self.ttl = ttl
+        self.document_cache = document_cache
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.query_batcher = query_batcher
+        self._cache = OrderedDict()  # {정규화된 질문: (저장 시각, 벡터)}
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.document_cache is None:
+            return self._embed_documents(texts)
+
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.document_cache.get_many(hashes)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for _ in range(len(texts) - len(missing)):
+            log_cache_hit("document_embedding")
+        for _ in missing:
+            log_cache_miss("document_embedding")
+        if missing:
+            computed = self._embed_documents([texts[i] for i in missing])
+            self.document_cache.put_many([hashes[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start_time = time.time()
+        if self.token_budget > 0 and len(texts) > 1:
+            vectors = [None] * len(texts)
+            for batch in plan_token_budget_batches(token_lengths(self.base, texts), self.token_budget,
+                                                   self.max_batch_size):
+                for i, vector in zip(batch, self.base.embed_documents([texts[i] for i in batch])):
+                    vectors[i] = vector
+        else:
+            vectors = self.base.embed_documents(texts)
+        log_stage_time("embed_documents", time.time() - start_time, source="indexing")
+        increment_counter("rag_embedded_texts_total", len(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        if self.max_size <= 0:
+            return self._embed_query(key)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._cache.move_to_end(key)
+                log_cache_hit("query_embedding")
+                return entry[1]
+            log_cache_miss("query_embedding")
+
+        start_time = time.time()
+        vector = self._embed_query(key)
+        log_stage_time("embed_query", time.time() - start_time, source="query")
+        with self._lock:
+            self._cache[key] = (now, vector)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def _embed_query(self, text: str) -> List[float]:
+        if self.query_batcher is not None:
+            return self.query_batcher.embed(text)
+        return self.base.embed_query(text)
+
+    def clear(self):
+        """캐시를 비웁니다."""
+        with self._lock:
+            self._cache.clear()
+
 # 임베딩 모델 호출, 2025-08-21 jylee (CUDA 자동 감지 기능 추가, 2025-09-03 jylee)
 def get_embedding_model():
     """임베딩 모델을 로드하고 반환합니다. 모델이 이미 로드된 경우 기존 객체를 반환합니다."""
@@ -22,29 +247,258 @@ def get_embedding_model():
         model_path = os.path.join(current_app.root_path, "..", "local_models", "jhgan_ko-sroberta-multitask")
         print(f"[-RAG-] Initializing embedding model from local path: {model_path}")
 
-        # CUDA 사용 가능 여부를 확인하고 장치를 동적으로 설정합니다.
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"[-RAG-] Embedding model will use device: {device}")
-        model_kwargs = {'device': device}
+        # EMBEDDING_BACKEND 가 onnx / onnx-int8 이면 ONNX Runtime 으로 실행합니다. (CPU 처리량 개선)
+        backend = current_app.config.get("EMBEDDING_BACKEND", "torch")
+        # 토큰 예산 배치를 사용하면, 배치가 모델 내부에서 다시 나뉘지 않도록 모델의 배치 크기를 최대 배치 크기로 맞춥니다.
+        # (사용하지 않으면 기존 배치 크기 32 그대로)
+        token_budget = current_app.config.get("EMBEDDING_TOKEN_BUDGET", 0)
+        max_batch_size = current_app.config.get("EMBEDDING_MAX_BATCH_SIZE", 64)
+        encode_kwargs = {'batch_size': max_batch_size} if token_budget > 0 else {}
+        base_model = None
+        if backend in ONNX_MODEL_FILES:
+            onnx_path = get_onnx_model_path(model_path, backend)
+            if os.path.exists(onnx_path):
+                print(f"[-RAG-] Embedding model will use ONNX Runtime backend: {onnx_path}")
+                base_model = OnnxSentenceEmbeddings(
+                    model_path, onnx_path,
+                    batch_size=max_batch_size if token_budget > 0 else 32,
+                    num_threads=current_app.config.get("EMBEDDING_ONNX_THREADS", 0)
+                )
+            else:
+                print(f"[-RAG-] Warning: ONNX model not found at {onnx_path} (run download_model.py --onnx). "
+                      f"Falling back to PyTorch backend.")
+                backend = "torch"
 
-        embedding_model = HuggingFaceEmbeddings(
-            model_name=model_path,
-            model_kwargs=model_kwargs
-        )
+        if base_model is None:
+            # CUDA 사용 가능 여부를 확인하고 장치를 동적으로 설정합니다.
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            print(f"[-RAG-] Embedding model will use device: {device}")
+            model_kwargs = {'device': device}
+
+            base_model = HuggingFaceEmbeddings(
+                model_name=model_path,
+                model_kwargs=model_kwargs,
+                encode_kwargs=encode_kwargs
+            )
+
+        # 반복되는 질문의 임베딩 계산을 줄이기 위해 LRU 캐시로 감쌉니다.
+        cache_size = current_app.config.get("QUERY_EMBEDDING_CACHE_SIZE", 1024)
+        cache_ttl = current_app.config.get("QUERY_EMBEDDING_CACHE_TTL", 3600)
+        print(f"[-RAG-] Query embedding cache: size={cache_size}, ttl={cache_ttl}s")
+
+        # 재인덱싱 / 컬렉션 재구축 시 같은 청크를 다시 계산하지 않도록 디스크 임베딩 캐시를 사용합니다.
+        document_cache = None
+        if current_app.config.get("EMBEDDING_DISK_CACHE_ENABLED", False):
+            # 백엔드마다 벡터가 조금씩 다르므로(int8 양자화 등) 캐시를 따로 사용
+            cache_model_name = current_app.config["EMBEDDING_MODEL"]
+            if backend != "torch":
+                cache_model_name = f"{cache_model_name}@{backend}"
+            document_cache = get_disk_embedding_cache(current_app.config["EMBEDDING_DISK_CACHE_DIR"], cache_model_name)
+        # 동시에 들어온 질문 임베딩을 모아 한 번에 계산합니다.
+        query_batcher = None
+        if current_app.config.get("QUERY_EMBEDDING_BATCH_ENABLED", False):
+            query_batcher = QueryEmbeddingBatcher(
+                base_model,
+                max_batch_size=current_app.config.get("QUERY_EMBEDDING_BATCH_MAX_SIZE", 16),
+                max_wait=current_app.config.get("QUERY_EMBEDDING_BATCH_MAX_WAIT", 0.005),
+                timeout=current_app.config.get("QUERY_EMBEDDING_BATCH_TIMEOUT", 5.0)
+            )
+            print(f"[-RAG-] Query embedding micro-batching: max_size={query_batcher.max_batch_size}, "
+                  f"max_wait={query_batcher.max_wait}s")
+        embedding_model = CachedQueryEmbeddings(base_model, max_size=cache_size, ttl=cache_ttl,
+                                                document_cache=document_cache,
+                                                token_budget=token_budget,
+                                                max_batch_size=max_batch_size,
+                                                query_batcher=query_batcher)
     return embedding_model
 
+# LLM 동시 실행 대기열이 가득 찼을 때 발생하는 예외
+class LLMBusyError(RuntimeError):
+    """LLM 실행 슬롯을 제한 시간 안에 얻지 못했을 때 발생합니다."""
+
+# Ollama 서버와 통신하는 공유 클라이언트 (연결 풀 + 동시 실행 제한)
+class OllamaClient:
+    """
+    모든 LLM 호출이 공유하는 Ollama HTTP 클라이언트입니다.
+    keep-alive 연결 풀(requests.Session)을 재사용하고, 동시에 실행되는 생성 요청 수를 max_in_flight 로 제한합니다.
+    슬롯을 기다리는 요청은 대기열에서 queue_timeout 초까지 기다리며, 초과 시 LLMBusyError 가 발생합니다.
+    백그라운드(평가 등) 요청은 사용자 요청이 대기 중이 아닐 때만, 최대 background_max_in_flight 개까지 실행됩니다.
+    """
+
+    def __init__(self, base_url: str, max_in_flight: int = 4, queue_timeout: float = 120,
+                 pool_size: int = 10, request_timeout: float = 300, background_max_in_flight: int = 1):
+        self.base_url = base_url.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.background_max_in_flight = min(background_max_in_flight, max_in_flight)
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self.waiting = 0
+        self.background_waiting = 0
+
+    def _can_run(self, background: bool) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        if background:
+            # 사용자 요청이 대기 중이면 양보
+            return self.waiting == 0 and self.background_in_flight < self.background_max_in_flight
+        return True
+
+    def _acquire_slot(self, model: str, background: bool = False):
+        """생성 슬롯을 얻을 때까지 기다리고, 대기 시간을 기록합니다."""
+        wait_start = time.time()
+        deadline = wait_start + self.queue_timeout
+        with self._condition:
+            if background:
+                self.background_waiting += 1
+            else:
+                self.waiting += 1
+            try:
+                while not self._can_run(background):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise LLMBusyError(f"LLM 요청 대기 시간({self.queue_timeout}s)을 초과했습니다.")
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+                if background:
+                    self.background_in_flight += 1
+            finally:
+                if background:
+                    self.background_waiting -= 1
+                else:
+                    self.waiting -= 1
+                # 사용자 요청의 대기 상태가 바뀌었으므로 백그라운드 대기자가 다시 확인하도록 알림
+                self._condition.notify_all()
+        log_stage_time("llm_queue_wait", time.time() - wait_start, source="background" if background else model)
+
+    def _release_slot(self, background: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if background:
+                self.background_in_flight -= 1
+            self._condition.notify_all()
+
+    def generate(self, model: str, prompt: str, options: dict = None, stop: Optional[List[str]] = None,
+                 background: bool = False) -> Iterator[str]:
+        """/api/generate 를 스트리밍으로 호출하여 생성되는 텍스트 조각을 반환합니다.
+        background=True 이면 사용자 요청보다 낮은 우선순위로 실행됩니다.
+        """
+        options = dict(options or {})
+        if stop:
+            options["stop"] = stop
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options}
+
+        self._acquire_slot(model, background=background)
+        gen_start = time.time()
+        try:
+            with self.session.post(f"{self.base_url}/api/generate", json=payload,
+                                   stream=True, timeout=self.request_timeout) as response:
+                if response.status_code != 200:
+                    raise ValueError(f"Ollama call failed with status code {response.status_code}. Details: {response.text}")
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise ValueError(f"Ollama error: {data['error']}")
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+        finally:
+            self._release_slot(background=background)
+            log_stage_time("llm_generate", time.time() - gen_start, source=model)
+
+    def get_stats(self) -> dict:
+        """현재 실행 중/대기 중인 요청 수를 반환합니다."""
+        with self._condition:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "background_in_flight": self.background_in_flight,
+                "background_waiting": self.background_waiting,
+                "max_in_flight": self.max_in_flight
+            }
+
+# 공유 클라이언트를 사용하는 LangChain LLM
+class PooledOllama(LLM):
+    """OllamaClient 를 통해 생성하는 LangChain LLM 입니다. 체인, 평가기 등에서 기존 Ollama LLM 대신 사용합니다."""
+    client: Any = Field(default=None, exclude=True)
+    model: str
+    temperature: float = 0.7
+    background: bool = False  # True 이면 사용자 요청보다 낮은 우선순위로 실행 (평가 등)
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-ollama"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "temperature": self.temperature}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        for text in self.client.generate(self.model, prompt, options={"temperature": self.temperature},
+                                         stop=stop, background=self.background):
+            chunk = GenerationChunk(text=text)
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+# 공유 Ollama 클라이언트를 반환하는 함수
+def get_llm_client(config: dict = None) -> OllamaClient:
+    """공유 Ollama 클라이언트를 반환합니다. 애플리케이션 컨텍스트 밖에서는 config 를 직접 전달합니다."""
+    global llm_client
+    if llm_client is None:
+        config = config or current_app.config
+        llm_client = OllamaClient(
+            base_url=config["LLM_HOST"],
+            max_in_flight=config.get("LLM_MAX_IN_FLIGHT", 4),
+            queue_timeout=config.get("LLM_QUEUE_TIMEOUT", 120),
+            pool_size=config.get("LLM_POOL_SIZE", 10),
+            request_timeout=config.get("LLM_REQUEST_TIMEOUT", 300),
+            background_max_in_flight=config.get("LLM_BACKGROUND_MAX_IN_FLIGHT", 1)
+        )
+        print(f"[-RAG-] Initialized Ollama client for {config['LLM_HOST']} (max in-flight: {llm_client.max_in_flight})")
+    return llm_client
+
 # 거대 언어 모델 호출 (LLM), 2025-08-21 jylee
-def get_llm():
-    """LLM을 로드하고 반환합니다. 모델이 이미 로드된 경우 기존 객체를 반환합니다."""
+def get_llm(temperature: float = None, config: dict = None, background: bool = False):
+    """LLM을 로드하고 반환합니다. 모델이 이미 로드된 경우 기존 객체를 반환합니다.
+    temperature 를 지정하면 같은 공유 클라이언트를 사용하는 해당 온도의 LLM을 반환합니다.
+    background=True 이면 사용자 요청보다 낮은 우선순위로 실행되는 LLM을 반환합니다. (평가용)
+    """
     global llm
-    if llm is None:
-        print(f"[-RAG-] Initializing LLM: {current_app.config['LLM_MODEL']}")
-        llm = Ollama(
-            base_url=current_app.config["LLM_HOST"],
-            model=current_app.config["LLM_MODEL"],
-            temperature=current_app.config["LLM_TEMPERATURE"]
-        )
-    return llm
+    config = config or current_app.config
+    if temperature is None:
+        temperature = config["LLM_TEMPERATURE"]
+
+    with llm_instances_lock:
+        instance = llm_instances.get((temperature, background))
+        if instance is None:
+            print(f"[-RAG-] Initializing LLM: {config['LLM_MODEL']} (temperature={temperature}, background={background})")
+            instance = PooledOllama(
+                client=get_llm_client(config),
+                model=config["LLM_MODEL"],
+                temperature=temperature,
+                background=background
+            )
+            llm_instances[(temperature, background)] = instance
+        if temperature == config["LLM_TEMPERATURE"] and not background:
+            llm = instance
+    return instance
 
 def init_models():
     """애플리케이션 시작 시 모델을 미리 로드합니다."""
@@ -0,0 +1,69 @@
+# pybo/rag/onnx_embeddings.py
+import json
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ONNX 모델 파일 이름 (download_model.py --onnx 로 <모델 폴더>/onnx/ 아래에 생성)
+ONNX_MODEL_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model_int8.onnx",  # 동적 int8 양자화 (가중치만 int8)
+}
+
+
+# 백엔드 이름에 해당하는 ONNX 모델 경로를 반환하는 함수
+def get_onnx_model_path(model_dir: str, backend: str) -> str:
+    return os.path.join(model_dir, "onnx", ONNX_MODEL_FILES[backend])
+
+
+def _read_max_seq_length(model_dir: str, default: int = 128) -> int:
+    """sentence-transformers 설정(sentence_bert_config.json)의 max_seq_length 를 읽습니다."""
+    try:
+        with open(os.path.join(model_dir, "sentence_bert_config.json"), "r", encoding="utf-8") as f:
+            return int(json.load(f).get("max_seq_length", default))
+    except (OSError, ValueError):
+        return default
+
+
+class OnnxSentenceEmbeddings(Embeddings):
+    """
+    ONNX Runtime(CPU)으로 sentence-transformers 모델을 실행하는 임베딩 클래스입니다.
+    토크나이저와 max_seq_length 는 원본 모델 폴더에서 읽고, 출력 토큰 벡터를 attention mask 기준 평균(mean pooling)하여
+    HuggingFaceEmbeddings(정규화 없음)와 같은 형태의 벡터를 반환합니다.
+    """
+
+    def __init__(self, model_dir: str, onnx_path: str, batch_size: int = 32, num_threads: int = 0):
+        # 선택 의존성: ONNX 백엔드를 사용할 때만 불러옴
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.batch_size = batch_size
+        self.max_seq_length = _read_max_seq_length(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(texts[i:i + self.batch_size], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
@@ -0,0 +1,100 @@
+# pybo/rag/pdf_extract.py
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List
+
+from flask import current_app
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+# 작업 프로세스에서 실행되는 함수는 pybo 패키지 밖의 모듈에 둔다.
+# (spawn 작업 프로세스가 pybo/__init__.py 를 거쳐 Flask, torch, chromadb 까지 불러오지 않도록)
+from pdf_worker import extract_page_range
+
+# PDF 텍스트 추출용 프로세스 풀 (첫 사용 시 생성, 이후 재사용)
+# pypdf 추출은 순수 파이썬이라 GIL 때문에 스레드로는 병렬화되지 않으므로 프로세스를 사용한다.
+# 멀티스레드 Flask 프로세스에서 fork 는 안전하지 않으므로 spawn 방식으로 생성한다.
+pdf_extract_executor = None
+pdf_extract_executor_lock = threading.Lock()
+
+
+def _get_pdf_extract_executor(max_workers: int) -> ProcessPoolExecutor:
+    global pdf_extract_executor
+    with pdf_extract_executor_lock:
+        if pdf_extract_executor is None:
+            pdf_extract_executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            print(f"[-RAG-] (PDF Extract) Started process pool with {max_workers} workers.")
+        return pdf_extract_executor
+
+
+def _reset_pdf_extract_executor():
+    """작업 프로세스가 비정상 종료되어 풀이 깨졌을 때 다음 사용 시 새로 만들도록 초기화합니다."""
+    global pdf_extract_executor
+    with pdf_extract_executor_lock:
+        if pdf_extract_executor is not None:
+            pdf_extract_executor.shutdown(wait=False, cancel_futures=True)
+            pdf_extract_executor = None
+
+
+# PDF 페이지 수를 반환하는 함수 (페이지 내용은 읽지 않음)
+def count_pdf_pages(filepath: str):
+    try:
+        return len(PdfReader(filepath).pages)
+    except Exception as e:
+        print(f"[-RAG-] Could not read page count of {filepath}: {e}")
+        return None
+
+
+# PDF 페이지를 순서대로 하나씩 반환하는 제너레이터
+def iter_pdf_pages(filepath: str, config: dict = None) -> Iterator[Document]:
+    """
+    PDF를 PDF_EXTRACT_PAGES_PER_TASK 쪽 단위로 나누어 프로세스 풀에서 병렬로 추출하고, 페이지 순서대로 Document 를 반환합니다.
+    동시에 제출하는 범위는 작업 프로세스 수의 2배로 제한하여, 소비 속도가 느려도 추출 결과가 메모리에 쌓이지 않도록 합니다.
+    페이지 수가 PDF_EXTRACT_MIN_PAGES 미만이거나 작업 프로세스가 1개 이하이면 현재 프로세스에서 추출합니다.
+    """
+    config = config or current_app.config
+    workers = config.get("PDF_EXTRACT_WORKERS", 2)
+    pages_per_task = max(1, config.get("PDF_EXTRACT_PAGES_PER_TASK", 8))
+    total_pages = count_pdf_pages(filepath)
+    if total_pages is None:
+        raise ValueError(f"PDF 파일을 읽을 수 없습니다: {filepath}")
+
+    page_ranges = [(start, start + pages_per_task) for start in range(0, total_pages, pages_per_task)]
+
+    if workers <= 1 or total_pages < config.get("PDF_EXTRACT_MIN_PAGES", 16):
+        for start, end in page_ranges:
+            for text, metadata in extract_page_range(filepath, start, end):
+                yield Document(page_content=text, metadata=metadata)
+        return
+
+    executor = _get_pdf_extract_executor(workers)
+    remaining_ranges = iter(page_ranges)
+    pending = deque()
+    try:
+        for start, end in remaining_ranges:
+            pending.append(executor.submit(extract_page_range, filepath, start, end))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            for text, metadata in pending.popleft().result():
+                yield Document(page_content=text, metadata=metadata)
+            next_range = next(remaining_ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(extract_page_range, filepath, *next_range))
+    except BrokenProcessPool:
+        _reset_pdf_extract_executor()
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# PDF 전체 페이지를 목록으로 반환하는 함수
+def load_pdf_pages(filepath: str, config: dict = None) -> List[Document]:
+    """iter_pdf_pages 결과를 페이지 순서대로 모두 모아 반환합니다. (PyPDFLoader(filepath).load() 대체)"""
+    return list(iter_pdf_pages(filepath, config=config))
@@ -18,21 +18,23 @@
 # pip install langsmith python-dotenv
 # ==============================================================================
 import os
+import re
+import threading
 import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from flask import current_app
 from operator import itemgetter
-from langchain.chains import LLMChain, RetrievalQA, create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import LLMChain, RetrievalQA, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.prompts import PromptTemplate
-from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.retrievers import EnsembleRetriever
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
 from . import models, vectorstore
-from .metrics import log_chatbot_response_time
+from .metrics import log_chatbot_response_time, log_stage_time
+from .tracing import start_trace, trace_config
 
 # 환경변수 로드
 load_dotenv()
@@ -43,6 +45,16 @@ model_path = os.getenv("DATA_FILE_PATH")
 # 전역 변수들을 None으로 초기화
 sentiment_chain = None
 
+# 감정 분석 체인 캐시: (KB 컬렉션 이름 목록, LLM 호스트, LLM 모델) -> 체인
+sentiment_chain_cache = {}
+sentiment_chain_lock = threading.Lock()
+
+# 대화형 RAG 체인 캐시: (컬렉션 키, k, LLM 호스트, LLM 모델, 온도) -> 체인 (LRU)
+conversational_chain_cache = OrderedDict()
+conversational_chain_lock = threading.Lock()
+# 캐시 무효화 횟수 (체인을 만드는 도중 무효화가 일어나면 만든 체인을 캐시에 저장하지 않기 위해 사용)
+conversational_chain_generation = 0
+
 # RAG(검색 증강 생성) 체인을 가져오는 함수
 def get_qa_chain(retriever):
     """RAG 체인을 생성합니다. retriever가 동적으로 변경되므로 체인을 캐시하지 않습니다."""
@@ -76,35 +88,23 @@ def get_sentiment_chain(config: dict):
     """
     print("[-RAG-] (Sentiment Chain) Initializing...")
     # 1. 일관된 답변을 위해 전용 LLM 인스턴스 생성 (낮은 temperature)
-    sentiment_llm = Ollama(
-        base_url=config["LLM_HOST"],
-        model=config["LLM_MODEL"],
-        temperature=0.1
-    )
+    # 공유 Ollama 클라이언트(연결 풀, 동시 실행 제한)를 사용합니다.
+    sentiment_llm = models.get_llm(temperature=0.1, config=config)
 
     # 2. 모든 지식 베이스 컬렉션에서 통합 검색을 위한 Retriever 가져오기, 2025-10-10 jylee
     # 여러 KB 파일에 대한 동시 검색을 지원합니다.
-    # 참고: vectorstore.py에 get_all_kb_collections() 함수가 필요할 수 있습니다.
+    # 질문은 한 번만 임베딩하고, 그 벡터로 모든 kb_ 컬렉션을 동시에 검색한 뒤 거리순으로 병합합니다.
     all_kb_collections = vectorstore.get_all_kb_collections()
 
     retriever = None
     if all_kb_collections:
-        # 리트리버 설정, k=3
-        retrievers = [
-            collection['vectordb'].as_retriever(search_kwargs={"k": 3})
-            for collection in all_kb_collections.values()
-        ]
-        
-        if len(retrievers) > 1:
-            # 2개 이상의 KB가 있으면 EnsembleRetriever로 결합
-            collection_names = [c['collection_name'] for c in all_kb_collections.values()]
-            print(f"[-RAG-] (Sentiment Chain) Creating EnsembleRetriever for {len(retrievers)} KB collections: {collection_names}")
-            retriever = EnsembleRetriever(retrievers=retrievers, weights=[0.5] * len(retrievers))
-        elif len(retrievers) == 1:
-            # 1개의 KB만 있으면 해당 retriever를 바로 사용
-            collection_name = list(all_kb_collections.values())[0]['collection_name']
-            print(f"[-RAG-] (Sentiment Chain) Using single retriever for KB collection: '{collection_name}'")
-            retriever = retrievers[0]
+        collection_names = list(all_kb_collections.keys())
+        print(f"[-RAG-] (Sentiment Chain) Creating multi-collection retriever for {len(collection_names)} KB collections: {collection_names}")
+        retriever = vectorstore.create_multi_collection_retriever(
+            {name: info['collection'] for name, info in all_kb_collections.items()},
+            k=3,
+            config=config
+        )
 
     # 3. 새로운 RAG 프롬프트 템플릿
     sentiment_prompt = PromptTemplate(
@@ -199,12 +199,65 @@ def get_sentiment_chain(config: dict):
     print(f"[-RAG-] Initialized RAG-based sentiment chain with LLM: {config['LLM_MODEL']}")
     return rag_chain
 
-
+# 캐시된 감정 분석 체인을 가져오는 함수
+def get_cached_sentiment_chain(config: dict):
+    """
+    KB 컬렉션 구성과 LLM 설정이 같으면 이전에 만든 감정 분석 체인을 재사용합니다.
+    KB 업로드/삭제 시 invalidate_sentiment_chain_cache() 로 무효화됩니다.
+    """
+    kb_names = tuple(sorted(vectorstore.get_all_kb_collections().keys()))
+    cache_key = (kb_names, config["LLM_HOST"], config["LLM_MODEL"])
+
+    with sentiment_chain_lock:
+        chain = sentiment_chain_cache.get(cache_key)
+        if chain is None:
+            chain = get_sentiment_chain(config)
+            # KB 구성이 바뀌면 이전 키는 더 이상 쓰이지 않으므로 비웁니다.
+            sentiment_chain_cache.clear()
+            sentiment_chain_cache[cache_key] = chain
+        else:
+            print(f"[-RAG-] (Sentiment Chain) Using cached chain for {len(kb_names)} KB collections.")
+    return chain
+
+# 감정 분석 체인 캐시를 비우는 함수
+def invalidate_sentiment_chain_cache(collection_name: str = None):
+    """KB 컬렉션이 변경되었을 때 감정 분석 체인 캐시를 비웁니다."""
+    if collection_name is not None and not collection_name.startswith("kb_"):
+        return
+    with sentiment_chain_lock:
+        if sentiment_chain_cache:
+            print(f"[-RAG-] (Sentiment Chain) Cache invalidated (collection: {collection_name}).")
+        sentiment_chain_cache.clear()
+
+vectorstore.register_collection_change_hook(invalidate_sentiment_chain_cache)
+
+
+# 이전 대화를 가리키는 표현(지시어, 접속어 등) 패턴
+ANAPHORA_PATTERN = re.compile(
+    r"(그|이|저)\s?(것|거|게|건|걸|분|사람|곳|때|내용|문서|부분|방법|중|경우|점)"
+    r"|그럼|그러면|그래서|그런데|그렇다면|그중|나머지|아까|방금|위에서|앞에서|앞의|위의"
+    r"|말한|말씀하신|얘기한|언급한|더 자세히|자세히 설명|다시|예시|예를 들"
+    r"|\b(it|that|this|they|them|those|these|he|she|its|their)\b",
+    re.IGNORECASE
+)
+
+# 질문 재작성이 필요한지 판단하는 함수
+def needs_query_rewrite(question: str, chat_history) -> bool:
+    """
+    대화 기록이 없거나, 질문에 이전 대화를 가리키는 표현이 없으면 재작성 없이 원래 질문으로 검색합니다.
+    "왜요?" 처럼 짧은 후속 질문은 문맥이 필요하므로 재작성합니다.
+    """
+    if not chat_history:
+        return False
+    if len(question.split()) <= 2:
+        return True
+    return bool(ANAPHORA_PATTERN.search(question))
 
 # 대화형 RAG 체인 생성 함수, 2025-08-27 jylee
 def get_conversational_rag_chain(retriever):
     """
     대화 기록을 바탕으로 질문을 재작성하고, 문서를 검색하여 답변을 생성하는 대화형 RAG 체인을 생성합니다.
+    첫 질문이거나 재작성이 필요 없는 질문은 질문 재작성 LLM 호출을 건너뜁니다.
     """
     llm = models.get_llm()
 
@@ -223,8 +276,29 @@ def get_conversational_rag_chain(retriever):
         ]
     )
     # 1-b. 질문 재작성 체인 생성
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
+    rewrite_chain = contextualize_q_prompt | llm | StrOutputParser()
+
+    # 1-c. 재작성 여부를 명시적으로 판단하고, 재작성 시간은 별도로 기록
+    def contextualize_question(inputs: dict) -> str:
+        question = inputs["input"]
+        if not needs_query_rewrite(question, inputs.get("chat_history")):
+            log_stage_time("rewrite", 0.0, source="챗봇", skipped=True)
+            return question
+        start_time = time.time()
+        standalone_question = rewrite_chain.invoke(inputs).strip()
+        log_stage_time("rewrite", time.time() - start_time, source="챗봇")
+        print(f"[-RAG-] Rewrote question: '{question}' -> '{standalone_question}'")
+        return standalone_question or question
+
+    # 1-d. 문서 검색 시간 기록
+    def retrieve_documents(question: str, config):
+        start_time = time.time()
+        docs = retriever.invoke(question, config=config)
+        log_stage_time("retrieve", time.time() - start_time, source="챗봇")
+        return docs
+
+    history_aware_retriever = (RunnableLambda(contextualize_question) | RunnableLambda(retrieve_documents)).with_config(
+        run_name="history_aware_retriever"
     )
 
     # 2. 최종 답변 생성을 위한 프롬프트
@@ -242,26 +316,77 @@ def get_conversational_rag_chain(retriever):
         ]
     )
     # 재작성된 질문과 검색된 문서를 받아 답변을 생성하는 체인 생성
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    stuff_documents_chain = create_stuff_documents_chain(llm, qa_prompt)
+
+    # 2-b. 답변 생성 시간 기록 (스트리밍 시에도 토큰을 그대로 전달하도록 제너레이터로 감쌈)
+    def generate_answer(inputs: dict, config):
+        start_time = time.time()
+        yield from stuff_documents_chain.stream(inputs, config=config)
+        log_stage_time("generate", time.time() - start_time, source="챗봇")
+
+    question_answer_chain = RunnableLambda(generate_answer).with_config(run_name="generate_answer")
 
     # 3. 위 두 체인을 하나로 결합
     rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
 
     return rag_chain
 
+# 캐시된 대화형 RAG 체인을 가져오는 함수
+def get_cached_conversational_rag_chain(collection_key: str, retriever_factory, k: int = 3):
+    """
+    컬렉션 키, k, LLM 설정이 같으면 이전에 만든 대화형 RAG 체인(retriever 포함)을 재사용합니다.
+    캐시에 없으면 retriever_factory() 로 retriever를 만들어 체인을 생성하며, retriever가 없으면 None을 반환합니다.
+    """
+    config = current_app.config
+    cache_key = (collection_key, k, config["LLM_HOST"], config["LLM_MODEL"], config["LLM_TEMPERATURE"])
+
+    with conversational_chain_lock:
+        chain = conversational_chain_cache.get(cache_key)
+        if chain is not None:
+            conversational_chain_cache.move_to_end(cache_key)
+            print(f"[-RAG-] Using cached conversational RAG chain for '{collection_key}' (k={k})")
+            return chain
+        generation = conversational_chain_generation
+
+    retriever = retriever_factory()
+    if retriever is None:
+        return None
+    chain = get_conversational_rag_chain(retriever)
+
+    with conversational_chain_lock:
+        if generation != conversational_chain_generation:
+            # 체인을 만드는 동안 컬렉션이 바뀌었으므로 이번 요청에만 사용하고 캐시에는 저장하지 않음
+            print(f"[-RAG-] Collections changed while building chain for '{collection_key}'. Not caching it.")
+            return chain
+        conversational_chain_cache[cache_key] = chain
+        conversational_chain_cache.move_to_end(cache_key)
+        while len(conversational_chain_cache) > config.get("CONVERSATIONAL_CHAIN_CACHE_SIZE", 32):
+            conversational_chain_cache.popitem(last=False)
+    return chain
+
+# 대화형 RAG 체인 캐시를 비우는 함수
+def invalidate_conversational_chain_cache(collection_name: str = None):
+    """파일 컬렉션이 변경되었을 때 해당 컬렉션과 전역 검색용 체인을 캐시에서 제거합니다."""
+    global conversational_chain_generation
+    if collection_name is not None and not collection_name.startswith("file_"):
+        return
+    with conversational_chain_lock:
+        conversational_chain_generation += 1
+        for cache_key in list(conversational_chain_cache.keys()):
+            # 전역 검색 체인은 모든 파일 컬렉션을 참조하므로 함께 제거
+            if collection_name is None or cache_key[0] in (collection_name, vectorstore.GLOBAL_COLLECTION_KEY):
+                del conversational_chain_cache[cache_key]
+
+vectorstore.register_collection_change_hook(invalidate_conversational_chain_cache)
+
 # 전역 검색 함수 : 사용자가 입력한 질문에 대해 RAG(검색 증강 생성) 방식으로 답변을 생성하는 함수
 def ask_rag(query: str):
-    # 모든 파일 컬렉션에서 리트리버를 가져와 통합 검색을 수행합니다.
-    all_collections = vectorstore.get_all_file_collections()
-    if not all_collections:
+    # 모든 파일 컬렉션을 동시에 검색하는 전역 retriever로 통합 검색을 수행합니다.
+    retriever = vectorstore.get_global_retriever(k=3)
+    if retriever is None:
         print("[-RAG-] No file collections available for global RAG search.")
         return "현재 검색할 수 있는 문서가 없습니다."
 
-    # 임시 방편: 첫 번째 컬렉션의 리트리버를 사용합니다.
-    # 실제 전역 검색을 위해서는 모든 컬렉션의 리트리버를 통합하는 로직이 필요합니다.
-    first_collection_key = next(iter(all_collections))
-    retriever = all_collections[first_collection_key]['vectordb'].as_retriever(search_kwargs={"k": 3})
-    
     chain = get_qa_chain(retriever)
     result = chain.invoke(query)
 
@@ -338,8 +463,8 @@ def analyze_sentiment_stream(config: dict, gender: str, age: str, emotion: str,
     """감정 분석을 스트리밍 방식으로 처리하고, 생성되는 텍스트 조각을 반환하며 응답 시간을 기록합니다."""
     start_time = time.time()
     
-    # RAG 체인 및 관련 구성 요소를 가져옵니다.
-    chain = get_sentiment_chain(config)
+    # RAG 체인 및 관련 구성 요소를 가져옵니다. (캐시된 체인 재사용)
+    chain = get_cached_sentiment_chain(config)
     
     # 사용자 입력을 RAG 체인에 맞는 딕셔너리 형태로 구성
     input_data = {
@@ -349,16 +474,27 @@ def analyze_sentiment_stream(config: dict, gender: str, age: str, emotion: str,
     }
     print(f"--- [RAG Sentiment Analysis] Query: {input_data['query']} ---")
 
-    # 1. 먼저 context를 생성하고 즉시 반환합니다.
-    context = chain.invoke(input_data)['context']
-    yield {"context": context}
+    # 체인을 한 번만 스트리밍 실행합니다. (검색 1회 + LLM 호출 1회)
+    # RunnablePassthrough.assign 체인은 입력 키 -> context -> answer 토큰 순서로 조각을 내보내므로,
+    # context 를 첫 이벤트로 보내고 이후 answer 토큰을 그대로 전달합니다.
+    # context 가 나올 때까지를 검색 시간, 이후 마지막 토큰까지를 생성 시간으로 기록합니다.
+    retrieved_time = None
+    trace = start_trace("감정 분석", config=config)
+    try:
+        for chunk in chain.stream(input_data, config=trace_config(trace)):
+            if "context" in chunk:
+                retrieved_time = time.time()
+                log_stage_time("retrieve", retrieved_time - start_time, source="감정 분석")
+                yield {"context": chunk["context"]}
+            if "answer" in chunk:
+                yield {"answer": chunk["answer"]}
+    finally:
+        if trace is not None:
+            trace.finish()
 
-    # 2. context를 포함한 전체 입력을 사용하여 답변 생성을 스트리밍합니다.
-    answer_chain = chain.pick("answer")
-    for chunk in answer_chain.stream(input_data):
-        yield {"answer": chunk}
-    
     end_time = time.time()
+    if retrieved_time is not None:
+        log_stage_time("generate", end_time - retrieved_time, source="감정 분석")
     log_chatbot_response_time(end_time - start_time, source="감정 분석")
 
 
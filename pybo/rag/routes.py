@@ -3,49 +3,38 @@ import json
 import os
 import threading
 import time
-from datetime import datetime
+import uuid
+from collections import OrderedDict
 
-from flask import Blueprint, render_template, request, url_for, redirect, flash, jsonify, session, current_app, Response
-from langchain.evaluation import load_evaluator
-from langchain_community.document_loaders import PyPDFLoader
+from flask import Blueprint, render_template, request, url_for, redirect, flash, jsonify, session, current_app, Response, stream_with_context
 from langchain_core.messages import HumanMessage, AIMessage
 
-from .metrics import get_chatbot_metrics, log_chatbot_response_time
-from .models import get_llm
-from .pipeline import summarize_text, get_conversational_rag_chain, analyze_sentiment_stream
+from pybo.models import EvaluationLog
+
+from . import answer_cache
+from .evaluation import start_evaluation_in_background, import_json_evaluation_logs
+from .ingestion import get_job, list_jobs
+from .metrics import get_latency_series, get_latency_summary, log_chatbot_response_time
+from .models import get_embedding_model, LLMBusyError
+from .pdf_extract import load_pdf_pages
+from .pipeline import summarize_text, get_cached_conversational_rag_chain, analyze_sentiment_stream
+from .tracing import start_trace, trace_config
 from .upload_utils import (
-    save_pdf_and_index, list_uploaded_pdfs, get_pdf_retriever,
+    save_pdf_and_enqueue, DuplicateUploadError, list_uploaded_pdfs, get_pdf_retriever,
     get_collection_names, get_file_collection_info, delete_collection_and_file,
     save_kb_and_index, list_uploaded_kbs, delete_kb_collection_and_file, get_kb_collection_info
 )
-from .vectorstore import get_persistent_client, get_all_file_collections
+from .vectorstore import (
+    get_persistent_client, get_global_retriever, notify_collection_changed, generate_collection_name,
+    GLOBAL_COLLECTION_KEY
+)
 
 bp = Blueprint("rag", __name__, url_prefix="/chat")
 
-# 평가기 캐싱을 위한 전역 변수
-relevance_evaluator = None
-conciseness_evaluator = None
-correctness_evaluator = None
-
-# 백그라운드 스레드에서 평가 실행 함수 (로그 경로 통일, 2025-09-04 jylee)
-def run_eval_in_background(app, question: str, prediction: str, log_type: str = 'normal_rag', full_data: dict = None):
-    """백그라운드 스레드에서 평가 및 로그 저장을 실행합니다."""
-    with app.app_context():
-        run_and_log_evaluation(question=question, prediction=prediction, log_type=log_type, full_data=full_data)
-
-# 백그라운드 스레드 시작 함수 (로그 경로 통일, 2025-09-15 jylee)
-def start_evaluation_in_background(question: str, prediction: str, log_type: str = 'normal_rag', full_data: dict = None):
-    """평가 함수를 백그라운드 스레드에서 실행을 시작합니다."""
-    app = current_app._get_current_object()
-    eval_thread = threading.Thread(
-        target=run_eval_in_background,
-        args=(app, question, prediction, log_type, full_data)
-    )
-    eval_thread.start()
-
 # ====== 라우팅 ======
 @bp.route("/", methods=["GET"])
 def index():
+    merge_streamed_answer()
     selected_file = request.args.get('file', default=None, type=str)
     if selected_file is not None:
         session['chat_history'] = []
@@ -53,7 +42,8 @@ def index():
     if 'chat_history' not in session:
         session['chat_history'] = []
 
-    files = list_uploaded_pdfs()
+    # 인덱싱이 끝난 파일만 선택할 수 있도록 표시
+    files = [file['filename'] for file in list_uploaded_pdfs(with_status=True) if file['status'] == 'ready']
     collection_info = get_file_collection_info()
 
     return render_template("rag/chat.html",
@@ -62,72 +52,277 @@ def index():
                            collection_info=collection_info,
                            selected_file=selected_file)
 
-# 질문을 처리하는 엔드포인트 (fetch API)
-@bp.route("/ask", methods=["POST"])
-def ask():
-    question = request.form.get("question")
-    selected_file = request.form.get("filename")
-    print(f"--- ask() called with question: '{question}', file: '{selected_file}' ---")
-    
-    if not question:
-        return jsonify({"error": "질문을 입력하세요"}), 400
+# 스트리밍 답변 임시 보관소: {답변 ID: {"created_at": 등록 시각, "answer": 답변 (생성 중이면 None)}}
+# 스트리밍 응답은 헤더(세션 쿠키)를 먼저 보내므로, 생성이 끝난 답변은 다음 요청에서 세션에 병합합니다.
+# 세션에는 병합을 기다리는 답변 ID 목록(pending_answer_ids)을 저장합니다.
+# 다시 요청하지 않는 클라이언트의 답변이 쌓이지 않도록 STREAMED_ANSWER_TTL 이 지나거나
+# STREAMED_ANSWER_MAX_ENTRIES 를 넘으면 오래된 항목부터 제거합니다.
+# (단일 프로세스 기준이며, 워커가 여러 개이면 해당 워커에서만 병합됩니다)
+streamed_answers = OrderedDict()
+streamed_answers_lock = threading.Lock()
+
+def _prune_streamed_answers(now: float):
+    config = current_app.config
+    ttl = config.get("STREAMED_ANSWER_TTL", 600)
+    max_entries = config.get("STREAMED_ANSWER_MAX_ENTRIES", 1000)
+    while streamed_answers:
+        oldest = next(iter(streamed_answers.values()))
+        if now - oldest["created_at"] < ttl and len(streamed_answers) <= max_entries:
+            break
+        streamed_answers.popitem(last=False)
+
+def register_streamed_answer() -> str:
+    """스트리밍 답변 ID를 만들어 보관소와 세션의 병합 대기 목록에 등록하고 반환합니다."""
+    answer_id = uuid.uuid4().hex
+    now = time.time()
+    with streamed_answers_lock:
+        _prune_streamed_answers(now)
+        streamed_answers[answer_id] = {"created_at": now, "answer": None}
+    session.setdefault('pending_answer_ids', []).append(answer_id)
+    session.modified = True
+    return answer_id
+
+def complete_streamed_answer(answer_id: str, answer: str):
+    """생성이 끝난 답변을 보관소에 저장합니다. 답변이 없으면(오류 등) 항목을 제거합니다."""
+    with streamed_answers_lock:
+        entry = streamed_answers.get(answer_id)
+        if entry is None:
+            return
+        if answer:
+            entry["answer"] = answer
+        else:
+            del streamed_answers[answer_id]
+
+def merge_streamed_answer():
+    """이전 스트리밍 요청에서 생성이 끝난 답변을 질문 순서대로 세션의 chat_history 에 추가합니다."""
+    answer_ids = session.get('pending_answer_ids')
+    if not answer_ids:
+        return
+    still_pending = []
+    with streamed_answers_lock:
+        for answer_id in answer_ids:
+            entry = streamed_answers.get(answer_id)
+            if entry is None:
+                # 만료되었거나 답변 없이 끝난 요청
+                continue
+            if entry["answer"] is None:
+                # 아직 생성 중
+                still_pending.append(answer_id)
+                continue
+            del streamed_answers[answer_id]
+            session.setdefault('chat_history', []).append({"role": "bot", "content": entry["answer"]})
+    session['pending_answer_ids'] = still_pending
+    session.modified = True
 
-    # 1. 세션의 chat_history 를 LangChain이 이해하는 형태로 변환, 2025-08-27 jylee
-    chat_history_from_session = session.get('chat_history', [])
+# 세션의 chat_history 를 LangChain이 이해하는 형태로 변환, 2025-08-27 jylee
+def build_chain_chat_history(chat_history_from_session: list) -> list:
     chat_history_for_chain = []
-    print(f"--- Chat History from Session: {chat_history_from_session} ---")
     for msg in chat_history_from_session:
         if msg['role'] == 'user':
             chat_history_for_chain.append(HumanMessage(content=msg['content']))
         elif msg['role'] == 'bot':
             chat_history_for_chain.append(AIMessage(content=msg['content']))
+    return chat_history_for_chain
+
+# 답변 캐시에서 첫 질문의 답변을 찾는 함수
+def lookup_cached_answer(question: str, collection_key: str, is_first_turn: bool):
+    """(캐시 사용 여부, 질문 임베딩, 캐시된 답변)을 반환합니다. 첫 질문이 아니면(대화 기록이 있으면) 캐시를 사용하지 않습니다."""
+    config = current_app.config
+    use_answer_cache = config.get("ANSWER_CACHE_ENABLED", True) and is_first_turn
+    if not use_answer_cache:
+        return False, None, None
+    # 질문 임베딩은 LRU 캐시에 저장되므로 이후 검색 단계에서 다시 계산하지 않습니다.
+    query_embedding = get_embedding_model().embed_query(question)
+    cached_answer = answer_cache.lookup_answer(
+        collection_key, query_embedding,
+        threshold=config.get("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0.95),
+        ttl=config.get("ANSWER_CACHE_TTL", 3600)
+    )
+    return True, query_embedding, cached_answer
 
-    # 2. 사용자 질문을 세션에 추가 (UI 표시용)
-    session['chat_history'].append({"role": "user", "content": question})
-    session.modified = True # 세션이 변경되었음을 플라스크에 알림
-
-    answer = ""
-    # 3. Retriever를 가져와 새로운 대화형 RAG 체인 생성
+# 선택한 파일(또는 전체 문서)에 대한 대화형 RAG 체인을 가져오는 함수
+def get_ask_chain(selected_file: str, collection_key: str):
+    """(체인, 오류 응답)을 반환합니다. 체인을 준비할 수 없으면 체인은 None 입니다."""
+    # Retriever 및 대화형 RAG 체인 준비 (컬렉션별로 캐시된 체인 재사용)
     if selected_file:
         print(f"[-RAG-] (ask) Using retriever for single file: {selected_file}")
-        retriever = get_pdf_retriever(selected_file)
+        k = 3
+        retriever_factory = lambda: get_pdf_retriever(selected_file, k=k)
     else:
         print("[-RAG-] (ask) No file selected. Using global retriever for all documents.")
-        # 전체 문서 검색 로직 (현재는 첫번째 컬렉션 사용)
-        all_collections = get_all_file_collections()
-        if not all_collections:
+        # 모든 파일 컬렉션을 동시에 검색하여 상위 결과를 병합
+        k = current_app.config.get("RAG_GLOBAL_SEARCH_K", 3)
+        retriever_factory = lambda: get_global_retriever(k=k)
+
+    conversational_rag_chain = get_cached_conversational_rag_chain(collection_key, retriever_factory, k=k)
+    if conversational_rag_chain is None:
+        if not selected_file:
             print("[-RAG-] (ask) Error: No document collections available.")
-            return jsonify({"error": "사용 가능한 문서 컬렉션이 없습니다."} ), 500
-        first_collection_key = next(iter(all_collections))
-        print(f"[-RAG-] (ask) Using retriever from the first available collection: '{first_collection_key}'")
-        retriever = all_collections[first_collection_key]['vectordb'].as_retriever()
-    # 4. RAG 체인 생성 및 질문 처리
-    if not retriever:
+            return None, (jsonify({"error": "사용 가능한 문서 컬렉션이 없습니다."} ), 500)
         print("--- Failed to get retriever ---")
-        return jsonify({"answer": "문서 검색기를 준비할 수 없습니다."} )
+        return None, jsonify({"answer": "문서 검색기를 준비할 수 없습니다."} )
+    return conversational_rag_chain, None
 
-    conversational_rag_chain = get_conversational_rag_chain(retriever)
+# 질문을 처리하는 엔드포인트 (fetch API)
+@bp.route("/ask", methods=["POST"])
+def ask():
+    question = request.form.get("question")
+    selected_file = request.form.get("filename")
+    print(f"--- ask() called with question: '{question}', file: '{selected_file}' ---")
+    
+    if not question:
+        return jsonify({"error": "질문을 입력하세요"}), 400
+
+    # 1. 세션의 chat_history 를 LangChain이 이해하는 형태로 변환, 2025-08-27 jylee
+    merge_streamed_answer()
+    chat_history_from_session = session.get('chat_history', [])
+    print(f"--- Chat History from Session: {chat_history_from_session} ---")
+    chat_history_for_chain = build_chain_chat_history(chat_history_from_session)
+    is_first_turn = not chat_history_from_session
+
+    # 2. 대화 기록이 없는 첫 질문이면, 같은 컬렉션에 대해 거의 같은 질문의 답변이 있는지 확인
+    collection_key = generate_collection_name(selected_file) if selected_file else GLOBAL_COLLECTION_KEY
+    start_time = time.time()
+    use_answer_cache, query_embedding, cached_answer = lookup_cached_answer(question, collection_key, is_first_turn)
+    if cached_answer is not None:
+        log_chatbot_response_time(time.time() - start_time, source="챗봇")
+        session.setdefault('chat_history', []).extend([
+            {"role": "user", "content": question},
+            {"role": "bot", "content": cached_answer},
+        ])
+        session.modified = True
+        return jsonify({"answer": cached_answer, "cached": True})
+
+    # 3. RAG 체인 준비
+    conversational_rag_chain, error_response = get_ask_chain(selected_file, collection_key)
+    if conversational_rag_chain is None:
+        return error_response
 
     # 4. 변환된 대화 기록과 새 질문으로 체인 실행
     print("--- Invoking conversational RAG chain ---")
     start_time = time.time()
-    result = conversational_rag_chain.invoke(
-        {"input": question,"chat_history": chat_history_for_chain}
-    )
+    trace = start_trace("챗봇")
+    try:
+        result = conversational_rag_chain.invoke(
+            {"input": question,"chat_history": chat_history_for_chain}, config=trace_config(trace)
+        )
+    except LLMBusyError as e:
+        print(f"--- LLM busy: {e} ---")
+        return jsonify({"error": "현재 요청이 많아 답변을 생성할 수 없습니다. 잠시 후 다시 시도해 주세요."}), 503
+    finally:
+        if trace is not None:
+            trace.finish()
     end_time = time.time()
     answer = result["answer"]
     log_chatbot_response_time(end_time - start_time, source="챗봇")
     print(f"--- RAG chain result: {result} ---")
 
+    # 첫 질문의 답변은 이후 같은 질문을 위해 캐시에 저장
+    if use_answer_cache:
+        answer_cache.store_answer(
+            collection_key, question, query_embedding, answer,
+            max_entries=current_app.config.get("ANSWER_CACHE_MAX_ENTRIES", 256)
+        )
+
     # normal_rag 타입으로 백그라운드 평가 실행
     start_evaluation_in_background(question, answer, log_type='normal_rag')
 
-    # 세션저장.
-    session['chat_history'].append({"role": "bot", "content": answer})
-    session.modified = True
+    # 세션저장. 질문과 답변을 함께 추가하여 실패한 질문(503 등)은 대화 기록에 남기지 않음
+    session.setdefault('chat_history', []).extend([
+        {"role": "user", "content": question},
+        {"role": "bot", "content": answer},
+    ])
+    session.modified = True # 세션이 변경되었음을 플라스크에 알림
 
     return jsonify({"answer": answer})
 
+# 질문을 처리하는 스트리밍 엔드포인트 (SSE), 검색된 문서를 먼저 보내고 답변 토큰을 생성되는 대로 전송
+@bp.route("/ask_stream", methods=["POST"])
+def ask_stream():
+    question = request.form.get("question")
+    selected_file = request.form.get("filename")
+    print(f"--- ask_stream() called with question: '{question}', file: '{selected_file}' ---")
+
+    if not question:
+        return jsonify({"error": "질문을 입력하세요"}), 400
+
+    merge_streamed_answer()
+    chat_history_from_session = session.get('chat_history', [])
+    chat_history_for_chain = build_chain_chat_history(chat_history_from_session)
+    is_first_turn = not chat_history_from_session
+
+    # 사용자 질문은 응답 헤더를 보내기 전에 세션에 저장
+    session.setdefault('chat_history', []).append({"role": "user", "content": question})
+    session.modified = True
+
+    collection_key = generate_collection_name(selected_file) if selected_file else GLOBAL_COLLECTION_KEY
+    start_time = time.time()
+    use_answer_cache, query_embedding, cached_answer = lookup_cached_answer(question, collection_key, is_first_turn)
+    if cached_answer is not None:
+        log_chatbot_response_time(time.time() - start_time, source="챗봇")
+        session['chat_history'].append({"role": "bot", "content": cached_answer})
+        session.modified = True
+
+        def generate_cached():
+            yield f"data: {json.dumps({'answer': cached_answer, 'cached': True})}\n\n"
+            yield "event: end\ndata: {}\n\n"
+        return Response(generate_cached(), mimetype='text/event-stream')
+
+    conversational_rag_chain, error_response = get_ask_chain(selected_file, collection_key)
+    if conversational_rag_chain is None:
+        # 답변을 만들 수 없으므로 방금 추가한 질문을 대화 기록에서 제거
+        session['chat_history'].pop()
+        session.modified = True
+        return error_response
+
+    # 생성이 끝난 답변은 다음 요청에서 세션에 병합
+    answer_id = register_streamed_answer()
+
+    trace = start_trace("챗봇")
+
+    def generate_stream():
+        start_time = time.time()
+        answer_parts = []
+        try:
+            for chunk in conversational_rag_chain.stream({"input": question, "chat_history": chat_history_for_chain},
+                                                         config=trace_config(trace)):
+                if "context" in chunk:
+                    sources = [
+                        {
+                            "filename": doc.metadata.get("filename", "N/A"),
+                            "page": doc.metadata.get("page"),
+                            "content": doc.page_content[:200]
+                        }
+                        for doc in chunk["context"]
+                    ]
+                    yield f"data: {json.dumps({'sources': sources})}\n\n"
+                if "answer" in chunk:
+                    answer_parts.append(chunk["answer"])
+                    yield f"data: {json.dumps({'answer': chunk['answer']})}\n\n"
+        except LLMBusyError as e:
+            print(f"--- LLM busy: {e} ---")
+            yield f"data: {json.dumps({'error': '현재 요청이 많아 답변을 생성할 수 없습니다. 잠시 후 다시 시도해 주세요.'})}\n\n"
+        except Exception as e:
+            print(f"--- Error during streaming RAG chain: {e} ---")
+            yield f"data: {json.dumps({'error': '답변 생성 중 오류가 발생했습니다.'})}\n\n"
+        finally:
+            if trace is not None:
+                trace.finish()
+
+        answer = "".join(answer_parts)
+        complete_streamed_answer(answer_id, answer)
+        if answer:
+            log_chatbot_response_time(time.time() - start_time, source="챗봇")
+            if use_answer_cache:
+                answer_cache.store_answer(
+                    collection_key, question, query_embedding, answer,
+                    max_entries=current_app.config.get("ANSWER_CACHE_MAX_ENTRIES", 256)
+                )
+            start_evaluation_in_background(question, answer, log_type='normal_rag')
+        yield "event: end\ndata: {}\n\n"
+
+    return Response(stream_with_context(generate_stream()), mimetype='text/event-stream')
+
 # 감정 분석 결과 로깅 엔드포인트, 2025-09-15 jylee
 @bp.route("/log_sentiment_result", methods=['POST'])
 def log_sentiment_result():
@@ -148,63 +343,11 @@ def log_sentiment_result():
         print(f"--- Error during sentiment logging: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-# ====== 평가 공통 함수 ======
-def run_and_log_evaluation(question: str, prediction: str, reference: str = None, log_type: str = 'normal_rag', full_data: dict = None):
-    """답변을 평가하고, 결과를 지정된 로그 경로에 JSON 파일로 저장합니다."""
-    global relevance_evaluator, conciseness_evaluator, correctness_evaluator
-    print(f"--- Starting evaluation for question: '{question[:50]}...' (Log type: {log_type}) ---")
-    try:
-        llm = get_llm()
-
-        if relevance_evaluator is None: relevance_evaluator = load_evaluator("criteria", criteria="relevance", llm=llm)
-        if conciseness_evaluator is None: conciseness_evaluator = load_evaluator("criteria", criteria="conciseness", llm=llm)
-
-        eval_results = {}
-        eval_results["relevance"] = relevance_evaluator.evaluate_strings(prediction=prediction, input=question)
-        eval_results["conciseness"] = conciseness_evaluator.evaluate_strings(prediction=prediction, input=question)
-
-        if reference:
-            if correctness_evaluator is None: correctness_evaluator = load_evaluator("qa", llm=llm)
-            eval_results["correctness"] = correctness_evaluator.evaluate_strings(prediction=prediction, reference=reference, input=question)
-
-        # 로그 데이터 생성
-        log_data = {
-            "timestamp": datetime.now().isoformat(),
-            "question": question,
-            "prediction": prediction,
-            "reference": reference,
-            "evaluation": eval_results
-        }
-
-        # sentiment_rag 타입일 경우, 전체 데이터 추가
-        if log_type == 'sentiment_rag' and full_data:
-            log_data.update(full_data)
-
-        # 로그 타입에 따라 저장 경로 결정 (기본값: normal_rag)
-        if log_type == 'sentiment_rag':
-            log_folder = 'sentiment_rag'
-        else:
-            log_folder = 'normal_rag'
-        logs_dir = os.path.join(current_app.root_path, '..', 'logs', log_folder)
-        os.makedirs(logs_dir, exist_ok=True)
-        
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        log_file_path = os.path.join(logs_dir, f"log_{timestamp_str}.json")
-
-        with open(log_file_path, 'w', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=4)
-
-        print(f"--- Evaluation successful. Log saved to {log_file_path} ---")
-        return eval_results
-
-    except Exception as e:
-        print(f"--- Evaluation Error ---: {e}")
-        return None
-
 # 챗봇 대화 기록을 초기화하는 엔드포인트
 @bp.route("/clear", methods=["POST"])
 def clear_chat():
     session.pop('chat_history', None)
+    session.pop('pending_answer_ids', None)
     return redirect(url_for('rag.index'))
 
 # PDF 파일 요약 엔드포인트
@@ -223,8 +366,7 @@ def summarize():
             print(f"--- File not found at path: {filepath} ---")
             return jsonify({"error": "File not found."} ), 404
 
-        loader = PyPDFLoader(filepath)
-        pages = loader.load()
+        pages = load_pdf_pages(filepath)
         full_text = "\n".join(page.page_content for page in pages)
         # 추출된 텍스트가 없는 경우 오류 반환
         if not full_text.strip():
@@ -256,10 +398,15 @@ def manage_files():
 
         if file and file.filename.endswith('.pdf'):
             try:
-                print(f"--- Uploading and indexing file: {file.filename} ---")
-                chunk_count = save_pdf_and_index(file)
-                print(f"--- File '{file.filename}' uploaded successfully with {chunk_count} chunks ---")
-                flash(f"PDF 파일이 성공적으로 업로드되었습니다. ({chunk_count}개 청크 생성)")
+                # 파싱/분할/임베딩은 백그라운드 작업 풀에서 실행하고 바로 목록 페이지로 돌아감
+                print(f"--- Uploading file and queueing indexing: {file.filename} ---")
+                # '이전 버전 교체'를 선택한 경우에만 같은 이름으로 올린 이전 파일을 삭제
+                job_id = save_pdf_and_enqueue(file, replace=bool(request.form.get('replace')))
+                print(f"--- File '{file.filename}' uploaded, indexing job {job_id} queued ---")
+                flash("PDF 파일이 업로드되었습니다. 인덱싱이 끝나면 목록에 청크 수가 표시됩니다.")
+            except DuplicateUploadError as e:
+                print(f"--- Skipped duplicate upload '{file.filename}' (same content as '{e.filename}') ---")
+                flash(f"같은 내용의 파일이 이미 업로드되어 있습니다: {e.filename}")
             except Exception as e:
                 print(f"--- Error uploading file '{file.filename}': {e} ---")
                 flash(f"파일 업로드 중 오류가 발생했습니다: {str(e)}")
@@ -268,7 +415,7 @@ def manage_files():
         return redirect(url_for('rag.manage_files'))
 
     # GET 요청 처리
-    files = list_uploaded_pdfs()
+    files = list_uploaded_pdfs(with_status=True)
     collection_info = get_file_collection_info()
     
     # 파일과 연결된 컬렉션 정보 가공
@@ -294,6 +441,20 @@ def manage_files():
                            all_collection_names=all_collection_names,
                            unlinked_collections=unlinked_collections)
 
+# 인덱싱 작업 진행 상황 조회 (폴링용)
+@bp.route("/files/jobs", methods=['GET'])
+def ingestion_jobs():
+    """대기/실행 중인 작업 목록을 반환합니다. ?all=1 이면 최근 완료/실패 작업도 포함합니다."""
+    active_only = request.args.get('all', default=0, type=int) == 0
+    return jsonify({"jobs": list_jobs(active_only=active_only)})
+
+@bp.route("/files/jobs/<job_id>", methods=['GET'])
+def ingestion_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    return jsonify(job)
+
 # 지식 베이스 관리 페이지
 @bp.route("/kb", methods=['GET', 'POST'])
 def manage_kb():
@@ -358,6 +519,7 @@ def delete_collection(collection_name):
         persistent_client = get_persistent_client()
         if persistent_client:
             persistent_client.delete_collection(name=collection_name)
+            notify_collection_changed(collection_name)
             print(f"--- Collection '{collection_name}' deleted successfully ---")
             flash(f"컬렉션 '{collection_name}'이(가) 삭제되었습니다.")
     except Exception as e:
@@ -373,6 +535,7 @@ def delete_kb_collection(collection_name):
         persistent_client = get_persistent_client()
         if persistent_client:
             persistent_client.delete_collection(name=collection_name)
+            notify_collection_changed(collection_name)
             print(f"--- Collection '{collection_name}' deleted successfully ---")
             flash(f"컬렉션 '{collection_name}'이(가) 삭제되었습니다.")
     except Exception as e:
@@ -427,53 +590,60 @@ def sentiment_analysis():
 # 성능 대시보드
 @bp.route("/performance")
 def performance_dashboard():
-    chatbot_data = get_chatbot_metrics()
-    chatbot_labels = [item['timestamp'] for item in chatbot_data]
-    chatbot_values = [item['duration'] for item in chatbot_data]
-    return render_template("rag/performance.html", chatbot_labels=chatbot_labels, chatbot_values=chatbot_values)
+    # 모든 워커가 저장한 히스토그램을 합산한 구간별 백분위 요약과 응답 시간 추이
+    config = current_app.config
+    summaries = [
+        (label, get_latency_summary(window_seconds))
+        for label, window_seconds in config.get("METRICS_WINDOWS", [("최근 1시간", 3600)])
+    ]
+    series = get_latency_series(
+        stage="total",
+        window_seconds=config.get("METRICS_CHART_WINDOW", 21600),
+        step_seconds=config.get("METRICS_CHART_STEP", 300)
+    )
+    return render_template("rag/performance.html", summaries=summaries,
+                           chart_labels=series["labels"], chart_series=series["series"])
 
 # 평가 결과 페이지
 @bp.route("/evaluation_results")
 def evaluation_results():
-    # 이 라우트는 이제 단순한 파일 목록 표시 기능만 필요
-    # 실제 로그는 logs/normal_rag 및 logs/sentiment_rag 에 저장됨
-    log_folders = ['normal_rag', 'sentiment_rag']
-    all_evaluations = []
-    base_logs_dir = os.path.join(current_app.root_path, '..', 'logs')
-    # 각 로그 폴더에서 JSON 파일 읽기
-    for folder in log_folders:
-        folder_path = os.path.join(base_logs_dir, folder)
-        if not os.path.exists(folder_path):
-            continue
-        for filename in sorted(os.listdir(folder_path), reverse=True):
-            if filename.endswith(".json"):
-                try:
-                    with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        data['filename'] = os.path.join(folder, filename)
-                        data['log_type'] = folder
-                        all_evaluations.append(data)
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f"Error reading or parsing {filename}: {e}")
-
-    # 성능 차트 데이터 처리
-    chatbot_data = get_chatbot_metrics()
-    
-    # 데이터를 source별로 분리하고 타임스탬프를 기준으로 정렬
-    all_timestamps = sorted(list(set(item['timestamp'] for item in chatbot_data)))
-    chatbot_metrics = {item['timestamp']: item['duration'] for item in chatbot_data if item['source'] == '챗봇'}
-    sentiment_metrics = {item['timestamp']: item['duration'] for item in chatbot_data if item['source'] == '감정 분석'}
-    chatbot_values = [chatbot_metrics.get(ts) for ts in all_timestamps]
-    sentiment_values = [sentiment_metrics.get(ts) for ts in all_timestamps]
-
-    normal_evals = [e for e in all_evaluations if e['log_type'] == 'normal_rag']
-    sentiment_evals = [e for e in all_evaluations if e['log_type'] == 'sentiment_rag']
+    # 평가 로그는 evaluation_log 테이블에 저장되며, 타입별로 최신순 페이지 단위로 조회한다
+    # (log_type, create_date) 인덱스를 사용하므로 로그가 쌓여도 페이지 조회 비용은 일정하다
+    per_page = current_app.config.get('EVAL_RESULTS_PER_PAGE', 10)
+    normal_page = request.args.get('normal_page', type=int, default=1)
+    sentiment_page = request.args.get('sentiment_page', type=int, default=1)
+    normal_evals = EvaluationLog.query.filter_by(log_type='normal_rag') \
+        .order_by(EvaluationLog.create_date.desc()) \
+        .paginate(page=normal_page, per_page=per_page)
+    sentiment_evals = EvaluationLog.query.filter_by(log_type='sentiment_rag') \
+        .order_by(EvaluationLog.create_date.desc()) \
+        .paginate(page=sentiment_page, per_page=per_page)
+
+    # 성능 차트 데이터 처리 (source별 전체 응답 시간 p95 추이)
+    config = current_app.config
+    series = get_latency_series(
+        stage="total",
+        window_seconds=config.get("METRICS_CHART_WINDOW", 21600),
+        step_seconds=config.get("METRICS_CHART_STEP", 300)
+    )
+    empty_values = [None] * len(series["labels"])
+    chatbot_values = series["series"].get("챗봇", {}).get("p95", empty_values)
+    sentiment_values = series["series"].get("감정 분석", {}).get("p95", empty_values)
 
     return render_template(
         "rag/evaluation_results.html", 
         normal_evals=normal_evals,
         sentiment_evals=sentiment_evals,
-        chart_labels=all_timestamps,
+        chart_labels=series["labels"],
         chatbot_chart_values=chatbot_values,
         sentiment_chart_values=sentiment_values
-    )
\ No newline at end of file
+    )
+
+
+# 기존 JSON 평가 로그 가져오기 (flask rag import-eval-logs)
+@bp.cli.command("import-eval-logs")
+def import_eval_logs_command():
+    """logs/normal_rag, logs/sentiment_rag 의 JSON 평가 로그를 evaluation_log 테이블로 가져옵니다."""
+    logs_root = os.path.join(current_app.root_path, '..', 'logs')
+    result = import_json_evaluation_logs(logs_root)
+    print(f"[-RAG-] (Evaluation Log) Imported {result['imported']}, skipped {result['skipped']}, failed {result['failed']}.")
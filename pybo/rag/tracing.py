@@ -0,0 +1,223 @@
+# pybo/rag/tracing.py
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from flask import current_app
+from langchain_core.callbacks import BaseCallbackHandler
+
+# JSONL 트레이스 파일 쓰기 잠금 (한 줄 = 한 요청)
+trace_sink_lock = threading.Lock()
+
+
+# 단계별 소요 시간을 부모 실행(run)의 하위 스팬으로 알리는 함수
+def emit_stage_event(run_manager, name: str, duration: float, **attributes):
+    """
+    retriever 내부처럼 LangChain 콜백이 따로 발생하지 않는 구간(질문 임베딩, ChromaDB 조회 등)의 소요 시간을
+    custom event 로 보내 RagTraceHandler 가 하위 스팬으로 기록하도록 합니다.
+    """
+    if run_manager is None:
+        return
+    try:
+        run_manager.get_child().on_custom_event(name, {"duration": duration, **attributes}, run_id=run_manager.run_id)
+    except Exception as e:
+        print(f"[-TRACE-] Failed to emit stage event '{name}': {e}")
+
+
+class RagTraceHandler(BaseCallbackHandler):
+    """
+    체인 실행 중 발생하는 콜백을 스팬(span)으로 기록하는 핸들러입니다. 요청마다 하나씩 생성합니다.
+    - 체인/프롬프트/retriever/LLM 실행마다 시작·종료 시각과 부모 관계를 기록
+    - retriever: 검색된 청크 수, LLM: 프롬프트 크기, 첫 토큰까지 시간(TTFT), 초당 토큰 수
+    finish() 호출 시 요청 요약과 스팬 목록을 JSONL 파일에 한 줄로 저장합니다.
+    """
+
+    def __init__(self, source: str, sink_path: str):
+        self.source = source
+        self.sink_path = sink_path
+        self.trace_id = uuid.uuid4().hex
+        self.start_time = time.time()
+        self.spans: Dict[UUID, dict] = {}
+        self.extra_spans: List[dict] = []
+        self.lock = threading.Lock()
+        self.finished = False
+
+    # --- 스팬 기록 ---
+    def _start_span(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes):
+        with self.lock:
+            self.spans[run_id] = {
+                "span_id": run_id.hex,
+                "parent_span_id": parent_run_id.hex if parent_run_id else None,
+                "name": name,
+                "kind": kind,
+                "start_time": time.time(),
+                "end_time": None,
+                "attributes": attributes,
+            }
+
+    def _end_span(self, run_id: UUID, error: BaseException = None, **attributes):
+        with self.lock:
+            span = self.spans.get(run_id)
+            if span is None:
+                return
+            span["end_time"] = time.time()
+            span["attributes"].update(attributes)
+            if error is not None:
+                span["attributes"]["error"] = repr(error)
+
+    @staticmethod
+    def _run_name(serialized: Optional[dict], kwargs: dict, default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        if serialized:
+            return serialized.get("name") or (serialized.get("id") or [default])[-1]
+        return default
+
+    # --- 체인 (프롬프트 구성, 문서 결합 포함) ---
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_span(run_id, parent_run_id, self._run_name(serialized, kwargs, "chain"), "chain")
+
+    def on_chain_end(self, outputs: Dict[str, Any], *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id, error=error)
+
+    # --- 문서 검색 ---
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID,
+                           parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_span(run_id, parent_run_id, self._run_name(serialized, kwargs, "retriever"), "retriever",
+                         query_chars=len(query))
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id, retrieved_chunks=len(documents),
+                       retrieved_chars=sum(len(doc.page_content) for doc in documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id, error=error)
+
+    # --- LLM 생성 ---
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_span(run_id, parent_run_id, self._run_name(serialized, kwargs, "llm"), "llm",
+                         prompt_chars=sum(len(prompt) for prompt in prompts), output_tokens=0)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        now = time.time()
+        with self.lock:
+            span = self.spans.get(run_id)
+            if span is None:
+                return
+            attributes = span["attributes"]
+            if "first_token_time" not in attributes:
+                attributes["first_token_time"] = now
+                attributes["time_to_first_token"] = now - span["start_time"]
+            attributes["output_tokens"] += 1
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id)
+        with self.lock:
+            span = self.spans.get(run_id)
+            attributes = span["attributes"] if span else {}
+            first_token_time = attributes.get("first_token_time")
+            if first_token_time is not None and span["end_time"] > first_token_time:
+                attributes["tokens_per_second"] = attributes["output_tokens"] / (span["end_time"] - first_token_time)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_span(run_id, error=error)
+
+    # --- 콜백이 없는 내부 구간 (emit_stage_event) ---
+    def on_custom_event(self, name: str, data: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if not isinstance(data, dict) or "duration" not in data:
+            return
+        end_time = time.time()
+        attributes = {key: value for key, value in data.items() if key != "duration"}
+        with self.lock:
+            self.extra_spans.append({
+                "span_id": uuid.uuid4().hex,
+                "parent_span_id": run_id.hex,
+                "name": name,
+                "kind": "stage",
+                "start_time": end_time - data["duration"],
+                "end_time": end_time,
+                "attributes": attributes,
+            })
+
+    # --- 요청 요약 및 저장 ---
+    def summarize(self) -> dict:
+        """요청 전체 소요 시간, 최종 답변 LLM 기준 TTFT/초당 토큰 수/프롬프트 크기, 검색된 청크 수를 반환합니다."""
+        with self.lock:
+            spans = list(self.spans.values())
+        llm_spans = sorted((span for span in spans if span["kind"] == "llm"), key=lambda span: span["start_time"])
+        summary = {
+            "duration": time.time() - self.start_time,
+            "retrieved_chunks": sum(span["attributes"].get("retrieved_chunks", 0)
+                                    for span in spans if span["kind"] == "retriever"),
+            "llm_calls": len(llm_spans),
+        }
+        # 마지막 LLM 호출이 사용자에게 보이는 답변 생성 (앞선 호출은 질문 재작성)
+        if llm_spans:
+            answer_attributes = llm_spans[-1]["attributes"]
+            summary["prompt_chars"] = answer_attributes.get("prompt_chars")
+            summary["output_tokens"] = answer_attributes.get("output_tokens")
+            summary["tokens_per_second"] = answer_attributes.get("tokens_per_second")
+            if "first_token_time" in answer_attributes:
+                summary["time_to_first_token"] = answer_attributes["first_token_time"] - self.start_time
+        return summary
+
+    def finish(self):
+        """요청 요약과 스팬 목록을 JSONL 파일에 한 줄로 저장합니다. 여러 번 호출해도 한 번만 저장합니다."""
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+        record = {
+            "trace_id": self.trace_id,
+            "source": self.source,
+            "start_time": self.start_time,
+            "summary": self.summarize(),
+            "spans": [
+                dict(span)
+                for span in sorted(list(self.spans.values()) + self.extra_spans, key=lambda span: span["start_time"])
+            ],
+        }
+        for span in record["spans"]:
+            span["attributes"] = {key: value for key, value in span["attributes"].items() if key != "first_token_time"}
+            span["duration"] = span["end_time"] - span["start_time"] if span["end_time"] else None
+        try:
+            with trace_sink_lock:
+                os.makedirs(os.path.dirname(self.sink_path), exist_ok=True)
+                with open(self.sink_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"[-TRACE-] Failed to write trace {self.trace_id}: {e}")
+            return
+        summary = record["summary"]
+        print(f"[-TRACE-] '{self.source}' trace {self.trace_id}: {summary['duration']:.3f}s, "
+              f"TTFT={summary.get('time_to_first_token')}, chunks={summary['retrieved_chunks']}")
+
+
+# 요청 트레이스를 시작하는 함수
+def start_trace(source: str, config: dict = None) -> Optional[RagTraceHandler]:
+    """
+    트레이싱이 켜져 있고 샘플링에 포함되면 새 RagTraceHandler 를 반환하고, 아니면 None 을 반환합니다.
+    애플리케이션 컨텍스트 밖(스트리밍 제너레이터 등)에서는 config 를 직접 전달합니다.
+    """
+    config = config or current_app.config
+    if not config.get("TRACING_ENABLED", False):
+        return None
+    if random.random() >= config.get("TRACE_SAMPLE_RATE", 1.0):
+        return None
+    return RagTraceHandler(source, config["TRACE_SINK_PATH"])
+
+
+# 체인 실행 시 전달할 config 를 만드는 함수
+def trace_config(handler: Optional[RagTraceHandler]) -> dict:
+    """handler 가 있으면 체인 호출에 넘길 {"callbacks": [handler]} 를, 없으면 빈 dict 를 반환합니다."""
+    return {"callbacks": [handler]} if handler is not None else {}
@@ -1,11 +1,15 @@
+import functools
+import hashlib
 import os
+import queue
+import threading
 from flask import current_app
 from typing import List, LiteralString
 from datetime import datetime
 import uuid
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from . import vectorstore
+from . import ingestion, pdf_extract, vectorstore
 from pybo.rag.models import (get_embedding_model)
 
 # upload_folder is now defined within the functions that use it
@@ -33,61 +37,272 @@ def save_pdf(file_storage) -> LiteralString | str | bytes:
     print(f"[-RAG-] save_pdf() result: {filepath}")
     return filepath
 
-# 저장된 pdf를 개별 컬렉션으로 인덱싱한다 (임베딩 및 벡터DB에 저장)
-# 2) index_pdf : PDF 파일을 로드하고, 텍스트를 분할한 후 파일별 벡터DB에 저장합니다.
-def index_pdf(filepath: str, chunk_size: int=500, chunk_overlap: int=50) -> int:
+# 페이지를 하나씩 읽어 분할하고, 청크를 batch_size 개씩 묶어 내보내는 제너레이터
+def iter_chunk_batches(pages, splitter, filepath: str, batch_size: int, progress=None, total_pages: int = None):
+    """
+    loader.lazy_load() 로 읽은 페이지를 한 장씩 분할하여 청크 배치를 생성합니다.
+    문서 전체를 메모리에 올리지 않으므로, 동시에 유지되는 것은 현재 페이지와 배치 하나뿐입니다.
+    (RecursiveCharacterTextSplitter 는 문서(페이지)별로 분할하므로 전체를 한 번에 분할한 결과와 같습니다)
+    """
+    progress = progress or _ignore_progress
     filename = os.path.basename(filepath)
-    print(f"[-RAG-] Starting indexing for PDF file: {filename}")
-    loader = PyPDFLoader(filepath)
-    # PDF의 모든 텍스트를 한 번에 메모리로 호출한다.
-    pages = loader.load()
+    batch = []
+    split_count = 0
+    for page_number, page in enumerate(pages, start=1):
+        progress("parse", page_number, total_pages)
+        # PDF에서 텍스트를 추출하지 못한 페이지 (예: 이미지로만 구성된 페이지)는 건너뜀
+        if not page.page_content or not page.page_content.strip():
+            continue
+        for doc in splitter.split_documents([page]):
+            # 일부 청크가 비어있을 수 있으므로 다시 확인
+            if not doc.page_content or not doc.page_content.strip():
+                continue
+            # 각 청크에 소스 정보 추가
+            doc.metadata["source"] = filepath
+            doc.metadata["filename"] = filename
+            batch.append(doc)
+            split_count += 1
+            progress("split", split_count, None)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+# 임베딩이 끝난 배치를 컬렉션에 쓰는 작업 스레드 본문
+def _write_batches(collection, write_queue: queue.Queue, state: dict, progress):
+    """
+    write_queue 에서 작업을 꺼내 컬렉션에 반영합니다. None 을 받으면 종료합니다.
+    ("add", ids, embeddings, texts, metadatas) : 새 청크 추가 / ("update", ids, metadatas) : 기존 청크의 메타데이터만 갱신
+    """
+    while True:
+        item = write_queue.get()
+        if item is None:
+            return
+        if state["error"] is not None:
+            # 앞선 쓰기가 실패했으면 남은 배치는 버리고 종료 신호만 기다림
+            continue
+        try:
+            if item[0] == "add":
+                _, ids, embeddings, texts, metadatas = item
+                collection.add(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+            else:
+                _, ids, metadatas = item
+                collection.update(ids=ids, metadatas=metadatas)
+            state["written"] += len(ids)
+            progress("write", state["written"], None)
+        except Exception as e:
+            state["error"] = e
+
+# 청크 내용 해시 (청크 ID 및 변경 여부 판단에 사용)
+def compute_chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# 파일 내용 해시 (같은 파일의 중복 업로드 판단에 사용)
+def compute_file_hash(stream) -> str:
+    """파일 객체(또는 경로)의 SHA-256 해시를 반환합니다. 파일 객체는 읽은 뒤 처음 위치로 되돌립니다."""
+    if isinstance(stream, str):
+        with open(stream, "rb") as f:
+            return compute_file_hash(f)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1024 * 1024), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+# 컬렉션에 저장된 청크 ID와 메타데이터를 모두 읽는 함수
+def _get_existing_chunks(collection, page_size: int = 1000) -> dict:
+    existing = {}
+    offset = 0
+    while True:
+        result = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for chunk_id, metadata in zip(result["ids"], result["metadatas"]):
+            existing[chunk_id] = metadata or {}
+        if len(result["ids"]) < page_size:
+            return existing
+        offset += page_size
+
+# 청크 배치를 임베딩하여 컬렉션에 반영하는 함수 (증분 인덱싱)
+def add_chunk_batches(collection_name: str, batches, progress=None, collection_metadata: dict = None,
+                      source_collection=None) -> int:
+    """
+    batches 의 청크를 컬렉션에 반영하고, 파일의 전체 청크 수를 반환합니다.
+    - 청크 ID는 내용 해시(같은 내용이 반복되면 순번 추가)이며, 해시는 메타데이터 content_hash 에도 저장합니다.
+    - 컬렉션에 이미 있는 청크는 임베딩하지 않고 (메타데이터가 바뀐 경우에만 갱신) 재사용하며,
+      새 파일에 없는 기존 청크는 마지막에 삭제합니다.
+    - 임베딩(현재 스레드)과 ChromaDB 쓰기(작업 스레드)를 크기가 제한된 큐로 연결하여,
+      배치 N을 저장하는 동안 배치 N+1 의 임베딩을 계산합니다. 큐가 가득 차면 임베딩이 잠시 대기합니다.
+    - 컬렉션은 첫 배치가 준비되었을 때 생성하므로 내용이 없는 파일은 컬렉션을 만들지 않습니다.
+    collection_metadata : 인덱싱이 끝난 뒤 컬렉션 메타데이터로 저장할 값 (file_hash, filename 등)
+    source_collection : 이전 버전 파일의 컬렉션. 같은 청크가 있으면 임베딩을 다시 계산하지 않고 복사합니다. (원본은 변경하지 않음)
+    """
+    progress = progress or _ignore_progress
+    client = vectorstore.get_persistent_client()
+    try:
+        collection = client.get_collection(name=collection_name)
+        existing = _get_existing_chunks(collection)
+    except Exception:
+        collection, existing = None, {}
+    source_ids = set(_get_existing_chunks(source_collection)) if source_collection is not None else set()
 
-    # PDF에서 텍스트를 추출하지 못한 경우 (예: 이미지로만 구성된 PDF)를 대비하여 필터링
-    pages_with_content = [doc for doc in pages if doc.page_content and doc.page_content.strip()]
-    
-    if not pages_with_content:
-        print(f"[-RAG-] Warning: No text could be extracted from {filename}. Skipping indexing.")
-        return 0
-    # 메모리에 올라단 모든 문서의 텍스트를 청크 단위로 분할
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs = splitter.split_documents(pages_with_content)
+    embedding_model = get_embedding_model()
+    write_queue = queue.Queue(maxsize=max(1, current_app.config.get("INDEX_WRITE_QUEUE_SIZE", 2)))
+    state = {"written": 0, "error": None}
+    writer = None
+    seen_ids = set()
+    hash_counts = {}
+    embedded_count = 0
+    try:
+        for batch_number, batch_docs in enumerate(batches, start=1):
+            if state["error"] is not None:
+                break
+            if writer is None:
+                if collection is None:
+                    collection = client.get_or_create_collection(name=collection_name)
+                writer = threading.Thread(target=_write_batches, args=(collection, write_queue, state, progress),
+                                          name=f"index-writer-{collection_name}", daemon=True)
+                writer.start()
+
+            new_docs, new_ids, copied_docs, copied_ids, changed_ids, changed_metadatas = [], [], [], [], [], []
+            for doc in batch_docs:
+                content_hash = compute_chunk_hash(doc.page_content)
+                occurrence = hash_counts.get(content_hash, 0)
+                hash_counts[content_hash] = occurrence + 1
+                chunk_id = content_hash if occurrence == 0 else f"{content_hash}_{occurrence}"
+                doc.metadata["content_hash"] = content_hash
+                seen_ids.add(chunk_id)
+                if chunk_id in source_ids and chunk_id not in existing:
+                    copied_docs.append(doc)
+                    copied_ids.append(chunk_id)
+                elif chunk_id not in existing:
+                    new_docs.append(doc)
+                    new_ids.append(chunk_id)
+                elif existing[chunk_id] != doc.metadata:
+                    changed_ids.append(chunk_id)
+                    changed_metadatas.append(doc.metadata)
+
+            if new_docs:
+                # 클라이언트 사이드에서 임베딩 생성, 2025-08-26 jylee (내용이 바뀐 청크만)
+                texts = [doc.page_content for doc in new_docs] # 챗봇 답변을 위한 원본 텍스트 추가, 2025-08-26 jylee
+                batch_embeddings = embedding_model.embed_documents(texts)
+                embedded_count += len(new_docs)
+                write_queue.put(("add", new_ids, batch_embeddings, texts, [doc.metadata for doc in new_docs]))
+            if copied_ids:
+                # 이전 버전 컬렉션에 있는 청크는 저장된 임베딩을 복사
+                copied = source_collection.get(ids=copied_ids, include=["embeddings"])
+                embeddings_by_id = dict(zip(copied["ids"], copied["embeddings"]))
+                write_queue.put(("add", copied_ids, [embeddings_by_id[chunk_id] for chunk_id in copied_ids],
+                                 [doc.page_content for doc in copied_docs], [doc.metadata for doc in copied_docs]))
+            if changed_ids:
+                write_queue.put(("update", changed_ids, changed_metadatas))
+            progress("embed", len(seen_ids), None)
+            print(f"[-RAG-] Batch {batch_number} for '{collection_name}': {len(new_docs)} embedded, "
+                  f"{len(batch_docs) - len(new_docs)} reused ({len(copied_ids)} copied from previous version).")
+    finally:
+        if writer is not None:
+            write_queue.put(None)
+            writer.join()
+
+    if state["error"] is not None:
+        raise state["error"]
+
+    # 새 파일에 없는 기존 청크 삭제
+    stale_ids = [chunk_id for chunk_id in existing if chunk_id not in seen_ids]
+    if stale_ids:
+        for i in range(0, len(stale_ids), 1000):
+            collection.delete(ids=stale_ids[i:i + 1000])
+    if collection is not None and collection_metadata:
+        collection.modify(metadata=collection_metadata)
+    print(f"[-RAG-] '{collection_name}': {len(seen_ids)} chunks ({embedded_count} embedded, "
+          f"{len(seen_ids) - embedded_count} reused, {len(stale_ids)} stale deleted).")
+    return len(seen_ids)
+
+# 이전 버전 파일의 컬렉션을 가져오는 함수
+def _get_previous_collection(previous_filename: str):
+    """이전 버전 파일의 컬렉션을 반환합니다. 없으면 None을 반환합니다. (임베딩 재사용용, 인덱싱이 끝날 때까지 그대로 유지)"""
+    previous_collection_name = vectorstore.generate_collection_name(previous_filename)
+    try:
+        return vectorstore.get_persistent_client().get_collection(name=previous_collection_name)
+    except Exception as e:
+        print(f"[-RAG-] Could not reuse collection '{previous_collection_name}': {e}. Indexing from scratch.")
+        return None
 
-    # 일부 문서가 비어있을 수 있으므로 최종적으로 다시 확인
-    final_docs = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
-    if not final_docs:
-        print(f"[-RAG-] Warning: Document splitting resulted in no content for {filename}. Skipping indexing.")
-        return 0
+# 이전 버전 파일과 컬렉션을 삭제하는 함수 (replace=True 로 업로드한 새 버전의 인덱싱이 끝난 뒤 호출)
+def _remove_previous_version(previous_filename: str):
+    previous_collection_name = vectorstore.generate_collection_name(previous_filename)
+    try:
+        vectorstore.get_persistent_client().delete_collection(name=previous_collection_name)
+    except Exception as e:
+        print(f"[-RAG-] Could not delete previous collection '{previous_collection_name}': {e}")
+    vectorstore.notify_collection_changed(previous_collection_name)
 
-    # 각 문서에 소스 정보 추가
-    for doc in final_docs:
-        doc.metadata["source"] = filepath
-        doc.metadata["filename"] = filename
+    previous_filepath = os.path.join(current_app.config["CHAT_UPLOAD_FOLDER"], previous_filename)
+    if os.path.exists(previous_filepath):
+        os.remove(previous_filepath)
+    print(f"[-RAG-] Replaced previous version: {previous_filepath}")
 
+# 저장된 pdf를 개별 컬렉션으로 인덱싱한다 (임베딩 및 벡터DB에 저장)
+# 2) index_pdf : PDF 파일을 페이지 단위로 읽고(lazy_load), 분할 -> 임베딩 -> 저장을 배치 단위로 흘려보냅니다.
+# progress : 단계별 진행률 콜백 progress(stage, done, total) (백그라운드 인덱싱 작업에서 전달)
+# previous_filename : 같은 원본 파일명의 이전 버전 파일 (있으면 해당 컬렉션의 임베딩을 복사해 바뀐 청크만 임베딩)
+# replace : True 이면 새 컬렉션이 완성된 뒤 이전 버전 파일과 컬렉션을 삭제 (기본값은 이전 버전을 그대로 유지)
+def index_pdf(filepath: str, chunk_size: int=500, chunk_overlap: int=50, progress=None,
+              previous_filename: str = None, original_filename: str = None, replace: bool = False) -> int:
+    filename = os.path.basename(filepath)
+    print(f"[-RAG-] Starting indexing for PDF file: {filename}")
     collection_name = vectorstore.generate_collection_name(filename)
-    collection = vectorstore.get_persistent_client().get_or_create_collection(name=collection_name)
+    previous_collection = _get_previous_collection(previous_filename) if previous_filename else None
+    try:
+        vectorstore.get_persistent_client().get_collection(name=collection_name)
+        collection_existed = True
+    except Exception:
+        collection_existed = False
 
-    # 청크 단위로 나누어 일괄 처리 (메모리 절약 및 성능 향상), 2025-08-26 jylee
-    embedding_model = get_embedding_model()
-    batch_size = 100  # Process 100 chunks at a time
-    total_chunks = len(final_docs)
-    for i in range(0, total_chunks, batch_size):
-        batch_docs = final_docs[i:i + batch_size]
-        
-        # 클라이언트 사이드에서 임베딩 생성, 2025-08-26 jylee
-        batch_embeddings = embedding_model.embed_documents(
-            [doc.page_content for doc in batch_docs]
-        )
+    # 페이지를 순서대로 받아 메모리 사용량이 문서 크기가 아닌 배치 크기에 비례하도록 함
+    # (텍스트 추출은 프로세스 풀에서 페이지 범위 단위로 병렬 실행)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    batch_size = current_app.config.get("INDEX_BATCH_SIZE", 100)
+    batches = iter_chunk_batches(pdf_extract.iter_pdf_pages(filepath), splitter, filepath, batch_size,
+                                 progress=progress, total_pages=pdf_extract.count_pdf_pages(filepath))
 
-        collection.add(
-            ids=[f"doc_{i + j}" for j in range(len(batch_docs))],
-            embeddings=batch_embeddings,
-            documents=[doc.page_content for doc in batch_docs], # 챗봇 답변을 위한 원본 텍스트 추가, 2025-08-26 jylee
-            metadatas=[doc.metadata for doc in batch_docs]
+    try:
+        chunk_count = add_chunk_batches(
+            collection_name, batches, progress=progress,
+            collection_metadata={
+                "file_hash": compute_file_hash(filepath),
+                "filename": filename,
+                "original_filename": original_filename or filename,
+            },
+            source_collection=previous_collection
         )
-        print(f"[-RAG-] Indexed batch {i // batch_size + 1}/{(total_chunks + batch_size - 1) // batch_size} with {len(batch_docs)} chunks.")
+    except Exception:
+        # 이 작업에서 만든 미완성 컬렉션은 삭제하고, 이전 버전은 그대로 둠
+        if not collection_existed:
+            try:
+                vectorstore.get_persistent_client().delete_collection(name=collection_name)
+            except Exception as e:
+                print(f"[-RAG-] Could not delete incomplete collection '{collection_name}': {e}")
+        vectorstore.notify_collection_changed(collection_name)
+        if previous_filename:
+            vectorstore.notify_collection_changed(vectorstore.generate_collection_name(previous_filename))
+        raise
+
+    if not chunk_count:
+        # 텍스트가 없는 새 버전으로 기존 인덱스를 대체하지 않음
+        print(f"[-RAG-] Warning: No text could be extracted from {filename}. Skipping indexing.")
+        return 0
 
-    print(f"[-RAG-] index_pdf() indexed {len(final_docs)} chunks from {filepath} into collection '{vectorstore.generate_collection_name(filename)}'")
-    return len(final_docs)
+    # 교체 요청인 경우에만, 새 컬렉션이 완성된 뒤에 이전 버전 파일과 컬렉션 삭제
+    if previous_filename and replace:
+        _remove_previous_version(previous_filename)
+
+    vectorstore.notify_collection_changed(collection_name)
+    print(f"[-RAG-] index_pdf() indexed {chunk_count} chunks from {filepath} into collection '{collection_name}'")
+    return chunk_count
+
+# 인덱싱 진행률을 보고하지 않을 때 사용하는 기본 콜백
+def _ignore_progress(stage: str, done: int, total: int = None):
+    pass
 
 # 3) 저장 + 인덱싱 헬퍼 : 추가된 청크 수 반환
 def save_pdf_and_index(file_storage) -> int:
@@ -95,12 +310,66 @@ def save_pdf_and_index(file_storage) -> int:
     print(f"[-RAG-] save_pdf_and_index() saved file at: {filepath}")
     return index_pdf(filepath=filepath)
 
+# 같은 내용의 파일이 이미 업로드되어 있을 때 발생하는 예외
+class DuplicateUploadError(Exception):
+    def __init__(self, filename: str):
+        super().__init__(f"같은 내용의 파일이 이미 업로드되어 있습니다: {filename}")
+        self.filename = filename
+
+# 3-1) 저장 후 백그라운드 인덱싱 작업 등록 : 작업 ID 반환
+def save_pdf_and_enqueue(file_storage, replace: bool = False) -> str:
+    """
+    파일을 저장하고 인덱싱은 백그라운드 작업 풀에서 실행합니다. 진행 상황은 반환된 작업 ID로 조회합니다.
+    - 내용이 같은 파일이 이미 인덱싱되어 있거나 인덱싱 중이면 저장하지 않고 DuplicateUploadError 를 발생시킵니다.
+    - 같은 원본 파일명으로 업로드된 이전 버전이 있으면, 이전 컬렉션을 넘겨받아 바뀐 청크만 다시 임베딩합니다.
+      이전 버전은 그대로 유지하며, replace=True 이면 새 버전 인덱싱이 끝난 뒤 이전 버전을 삭제합니다.
+    """
+    file_hash = compute_file_hash(file_storage.stream)
+    # 동시에 올라온 같은 파일을 막기 위해 컬렉션 확인 전에 해시를 먼저 예약
+    pending_filename = ingestion.reserve_file_hash(file_hash, file_storage.filename)
+    if pending_filename is not None:
+        raise DuplicateUploadError(pending_filename)
+    try:
+        duplicate = vectorstore.find_collection_by_metadata("file_", "file_hash", file_hash)
+        if duplicate is not None:
+            raise DuplicateUploadError(duplicate.metadata.get("filename", duplicate.name))
+        previous = vectorstore.find_collection_by_metadata("file_", "original_filename", file_storage.filename)
+        previous_filename = previous.metadata.get("filename") if previous is not None else None
+
+        filepath = save_pdf(file_storage)
+        index_func = functools.partial(index_pdf, previous_filename=previous_filename,
+                                       original_filename=file_storage.filename, replace=replace)
+        return ingestion.submit_ingestion_job(os.path.basename(filepath), index_func, filepath, file_hash=file_hash)
+    except Exception:
+        ingestion.release_file_hash(file_hash)
+        raise
+
 # 4) 업로드된 pdf 파일명 목록
-def list_uploaded_pdfs() -> List[str]:
+# with_status=True 이면 [{"filename", "status", "job_id"}] 형태로 반환
+# status : 'indexing'(인덱싱 대기/진행 중), 'failed'(인덱싱 실패), 'ready'(검색 가능)
+def list_uploaded_pdfs(with_status: bool = False) -> List:
     upload_folder = current_app.config["CHAT_UPLOAD_FOLDER"]
     os.makedirs(upload_folder, exist_ok=True)
     print(f"[-RAG-] list_uploaded_pdfs() in folder: {upload_folder}")
-    return sorted([f for f in os.listdir(upload_folder) if f.endswith('.pdf')])
+    filenames = sorted([f for f in os.listdir(upload_folder) if f.endswith('.pdf')])
+    if not with_status:
+        return filenames
+
+    # 작업 목록은 메모리에만 있으므로(재시작/만료 시 사라짐) 작업이 없는 파일은 컬렉션 존재 여부로 판단
+    collection_names = set(vectorstore.get_all_file_search_collections() or {})
+    files = []
+    for filename in filenames:
+        job = ingestion.get_latest_file_job(filename)
+        if job is None:
+            status = "ready" if vectorstore.generate_collection_name(filename) in collection_names else "missing"
+        elif job["status"] == "done":
+            status = "ready"
+        elif job["status"] == "failed":
+            status = "failed"
+        else:
+            status = "indexing"
+        files.append({"filename": filename, "status": status, "job_id": job["id"] if job else None})
+    return files
 
 # 5) 특정 pdf에만 한정된 retriever 생성 (개별 컬렉션에서)
 def get_pdf_retriever(filename: str, k: int=3):
@@ -203,6 +472,7 @@ def delete_collection_and_file(filename: str) -> bool:
         if filename in vectorstore.get_all_file_collections():
             del vectorstore.get_all_file_collections()[filename]
             print(f"[-RAG-] Removed '{filename}' from in-memory cache.")
+        vectorstore.notify_collection_changed(collection_name)
         
         return True
     except Exception as e:
@@ -228,51 +498,31 @@ def index_kb(filepath: str, chunk_size: int = 500, chunk_overlap: int = 50) -> i
     filename = os.path.basename(filepath)
     print(f"[-RAG-] Starting indexing for KB file: {filename}")
     
-    # 파일 확장자에 따라 다른 로더 사용
+    # 파일 확장자에 따라 다른 로더 사용 (PDF는 프로세스 풀에서 병렬 추출)
     if filename.endswith('.pdf'):
-        loader = PyPDFLoader(filepath)
+        pages = pdf_extract.iter_pdf_pages(filepath)
     elif filename.endswith('.txt'):
-        loader = TextLoader(filepath, encoding='utf-8')
+        pages = TextLoader(filepath, encoding='utf-8').lazy_load()
     else:
         raise ValueError("Unsupported file type for KB indexing")
 
-    pages = loader.load()
-    pages_with_content = [doc for doc in pages if doc.page_content and doc.page_content.strip()]
-    if not pages_with_content:
-        return 0
-
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    docs = splitter.split_documents(pages_with_content)
-    final_docs = [doc for doc in docs if doc.page_content and doc.page_content.strip()]
-    if not final_docs:
-        return 0
-
-    for doc in final_docs:
-        doc.metadata["source"] = filepath
-        doc.metadata["filename"] = filename
+    batches = iter_chunk_batches(pages, splitter, filepath, batch_size=current_app.config.get("INDEX_BATCH_SIZE", 100))
 
     # 'kb_' 접두사를 사용해 파일별 고유 컬렉션 이름 생성
+    # 같은 파일명으로 다시 업로드하면 같은 컬렉션에서 바뀐 청크만 다시 임베딩
     collection_name = vectorstore.generate_collection_name(filename, prefix="kb")
-    collection = vectorstore.get_persistent_client().get_or_create_collection(name=collection_name)
+    chunk_count = add_chunk_batches(
+        collection_name, batches,
+        collection_metadata={"file_hash": compute_file_hash(filepath), "filename": filename}
+    )
+    if not chunk_count:
+        return 0
 
-    embedding_model = get_embedding_model()
-    batch_size = 100
-    total_chunks = len(final_docs)
-    for i in range(0, total_chunks, batch_size):
-        batch_docs = final_docs[i:i + batch_size]
-        batch_embeddings = embedding_model.embed_documents([doc.page_content for doc in batch_docs])
-        
-        # ID를 파일명과 청크 인덱스로 구성하여 고유성 보장
-        ids = [f"{filename}_{i + j}" for j in range(len(batch_docs))]
-        
-        collection.add(
-            ids=ids,
-            embeddings=batch_embeddings,
-            documents=[doc.page_content for doc in batch_docs],
-            metadatas=[doc.metadata for doc in batch_docs]
-        )
-    print(f"[-RAG-] Indexed {len(final_docs)} chunks from {filepath} into collection '{collection_name}'")
-    return len(final_docs)
+    # 감정 분석 체인 등 KB 컬렉션을 참조하는 캐시 무효화
+    vectorstore.notify_collection_changed(collection_name)
+    print(f"[-RAG-] Indexed {chunk_count} chunks from {filepath} into collection '{collection_name}'")
+    return chunk_count
 
 # 지식 베이스 파일 목록을 반환하는 함수, 2025-09-12 jylee
 def list_uploaded_kbs() -> List[str]:
@@ -330,6 +580,9 @@ def delete_kb_collection_and_file(filename: str) -> bool:
             # 다른 예외 발생 시 로그 남기기
             print(f"[-RAG-] Error deleting KB collection '{collection_name}': {e}")
 
+        # 3. KB 컬렉션을 참조하는 캐시 무효화
+        vectorstore.notify_collection_changed(collection_name)
+
         return True
     except Exception as e:
         print(f"Error during KB deletion for {filename}: {e}")
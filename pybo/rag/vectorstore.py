@@ -2,12 +2,21 @@
 import os
 import re
 import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List
 
 import chromadb
 from flask import current_app
 from langchain_chroma import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 
 from . import models
+from .metrics import log_stage_time
+from .tracing import emit_stage_event
 
 # ChromaDB 클라이언트 인스턴스를 캐시하기 위한 전역 변수
 persistent_client_instance = None
@@ -31,6 +40,42 @@ def get_persistent_client():
 # 파일별 컬렉션을 저장하는 딕셔너리
 file_collections = {}
 
+# 지식 베이스(kb_) 컬렉션 캐시 (None 이면 다음 호출 시 서버에서 다시 로드)
+kb_collections_cache = None
+
+# 전역 검색(모든 file_ 컬렉션 대상) 결과를 캐시할 때 사용하는 컬렉션 키
+GLOBAL_COLLECTION_KEY = "__global__"
+
+# 전역 검색용 파일(file_) 컬렉션 캐시 (None 이면 다음 호출 시 서버에서 다시 로드)
+file_search_collections_cache = None
+
+# 컬렉션이 추가/삭제될 때 호출할 캐시 무효화 함수 목록
+collection_change_hooks = []
+
+def register_collection_change_hook(hook):
+    """컬렉션 변경 시 호출될 함수를 등록합니다. hook(collection_name) 형태로 호출됩니다."""
+    if hook not in collection_change_hooks:
+        collection_change_hooks.append(hook)
+
+def notify_collection_changed(collection_name: str = None):
+    """컬렉션이 생성/재인덱싱/삭제되었음을 알리고, 관련 캐시를 무효화합니다.
+    collection_name 이 None 이면 모든 캐시를 무효화합니다.
+    """
+    global kb_collections_cache, file_search_collections_cache
+    if collection_name is None or collection_name.startswith("kb_"):
+        kb_collections_cache = None
+    if collection_name is None or collection_name.startswith("file_"):
+        file_search_collections_cache = None
+        # 삭제/재생성된 컬렉션을 가리키는 Chroma 래퍼도 제거 (다음 조회 시 다시 로드)
+        for filename in [name for name, info in file_collections.items()
+                         if collection_name is None or info['collection_name'] == collection_name]:
+            del file_collections[filename]
+    for hook in collection_change_hooks:
+        try:
+            hook(collection_name)
+        except Exception as e:
+            print(f"[-RAG-] Error in collection change hook for '{collection_name}': {e}")
+
 # 파일명을 기반으로 컬렉션 이름을 생성하는 함수
 def generate_collection_name(filename: str, prefix: str = "file") -> str:
     """파일 이름으로부터 ChromaDB 컬렉션 이름을 생성합니다."""
@@ -75,20 +120,191 @@ def generate_collection_name(filename: str, prefix: str = "file") -> str:
     print(f"[-RAG-] Generated collection name '{final_name}' for filename '{filename}'")
     return final_name  # ChromaDB 이름 길이 제한(63) 준수
 
-# 벡터 데이터베이스를 가져오는 함수 (모든 문서를 검색 대상으로 함)
-def get_vectordb():
-    """모든 문서의 내용을 담고 있는 전역 벡터DB를 반환합니다."""
-    # 모든 파일 컬렉션을 가져와 하나의 ChromaDB 인스턴스로 통합
-    all_collections = get_all_file_collections()
-    if not all_collections:
-        print("[-RAG-] No file collections available for global vector DB.")
+# 전역 검색에 사용할 스레드 풀 (요청마다 생성하지 않고 재사용, init_app 에서 RAG_GLOBAL_SEARCH_MAX_WORKERS 로 생성)
+global_search_executor = None
+global_search_executor_size = None
+global_search_executor_lock = threading.Lock()
+
+# 제한 시간을 넘긴 뒤에도 검색이 계속 실행 중인 컬렉션
+# 실행 중인 검색은 취소할 수 없으므로, 끝날 때까지 해당 컬렉션에는 새 검색을 보내지 않아
+# 느린 컬렉션이 스레드 풀을 모두 차지하지 않도록 합니다. (컬렉션당 최대 1개 스레드)
+slow_collections = set()
+slow_collections_lock = threading.Lock()
+
+def init_global_search_executor(max_workers: int):
+    """전역 검색용 스레드 풀을 max_workers 크기로 (다시) 만듭니다. 크기가 같으면 기존 풀을 유지합니다."""
+    global global_search_executor, global_search_executor_size
+    with global_search_executor_lock:
+        if global_search_executor is not None and global_search_executor_size == max_workers:
+            return global_search_executor
+        previous_executor = global_search_executor
+        global_search_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-search")
+        global_search_executor_size = max_workers
+    if previous_executor is not None:
+        # 실행 중인 검색은 끝까지 실행되고, 새 검색은 새 풀에서 실행
+        previous_executor.shutdown(wait=False)
+    print(f"[-RAG-] (Global Search) Thread pool size: {max_workers}")
+    return global_search_executor
+
+def _get_global_search_executor(max_workers: int):
+    """전역 검색용 스레드 풀을 반환합니다. init_app 전에 호출되면 max_workers 크기로 생성합니다."""
+    executor = global_search_executor
+    if executor is None:
+        executor = init_global_search_executor(max_workers)
+    return executor
+
+def _release_slow_collection(collection_name: str):
+    with slow_collections_lock:
+        slow_collections.discard(collection_name)
+    print(f"[-RAG-] (Global Search) Timed-out search on '{collection_name}' finished. Collection searchable again.")
+
+# 임베딩 벡터로 단일 컬렉션을 검색하는 내부 함수
+def _query_collection_by_vector(collection, query_embedding, k: int):
+    """컬렉션에서 query_embedding 과 가까운 문서를 (Document, distance) 목록으로 반환합니다."""
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=k,
+        include=["documents", "metadatas", "distances"]
+    )
+    scored_docs = []
+    for text, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0]):
+        metadata = dict(metadata or {})
+        metadata["collection_name"] = collection.name
+        scored_docs.append((Document(page_content=text, metadata=metadata), distance))
+    return scored_docs
+
+# 여러 컬렉션을 동시에 검색하고 결과를 병합하는 Retriever
+class MultiCollectionRetriever(BaseRetriever):
+    """
+    질문을 한 번만 임베딩한 뒤, 그 벡터로 여러 ChromaDB 컬렉션을 스레드 풀에서 동시에 검색(collection.query)하고
+    거리(distance)가 가까운 순으로 병합하여 상위 k개를 반환합니다.
+    timeout 안에 응답하지 않은 컬렉션은 결과에서 제외되므로, 느린 컬렉션 하나가 전체 답변을 지연시키지 않습니다.
+    """
+    collections: Dict[str, Any]  # {컬렉션 이름: chromadb Collection}
+    embedding: Any
+    k: int = 3
+    timeout: float = 5.0
+    max_workers: int = 8
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if not self.collections:
+            return []
+
+        # 컬렉션 수와 관계없이 질문 임베딩은 한 번만 계산합니다.
+        start_time = time.time()
+        query_embedding = self.embedding.embed_query(query)
+        emit_stage_event(run_manager, "embed_query", time.time() - start_time)
+
+        executor = _get_global_search_executor(self.max_workers)
+        with slow_collections_lock:
+            skipped = [name for name in self.collections if name in slow_collections]
+        if skipped:
+            print(f"[-RAG-] (Global Search) Skipping {len(skipped)} collection(s) with a timed-out search still running: {skipped}")
+        futures = {
+            executor.submit(_query_collection_by_vector, collection, query_embedding, self.k): collection_name
+            for collection_name, collection in self.collections.items()
+            if collection_name not in skipped
+        }
+        if not futures:
+            return []
+        search_start_time = time.time()
+        done, not_done = wait(futures, timeout=self.timeout)
+        search_duration = time.time() - search_start_time
+        log_stage_time("chroma_query", search_duration, source="global_search")
+        emit_stage_event(run_manager, "chroma_query", search_duration,
+                         collections=len(futures), timed_out=len(not_done))
+
+        scored_docs = []
+        for future in done:
+            try:
+                scored_docs.extend(future.result())
+            except Exception as e:
+                print(f"[-RAG-] (Global Search) Error searching collection '{futures[future]}': {e}")
+        for future in not_done:
+            collection_name = futures[future]
+            # 아직 시작하지 않은 검색은 취소하고, 이미 실행 중인 검색은 끝날 때까지 해당 컬렉션을 건너뜁니다.
+            if not future.cancel():
+                with slow_collections_lock:
+                    slow_collections.add(collection_name)
+                future.add_done_callback(lambda _, name=collection_name: _release_slow_collection(name))
+            print(f"[-RAG-] (Global Search) Collection '{collection_name}' timed out after {self.timeout}s. Skipped.")
+
+        # 같은 임베딩 모델을 사용하므로 컬렉션 간 거리를 직접 비교할 수 있습니다.
+        scored_docs.sort(key=lambda item: item[1])
+        print(f"[-RAG-] (Global Search) Merged {len(scored_docs)} results from {len(done)}/{len(futures)} collections.")
+        return [doc for doc, _ in scored_docs[:self.k]]
+
+# 접두사로 시작하는 ChromaDB 컬렉션 객체를 모두 로드하는 내부 함수
+def _load_collections_by_prefix(prefix: str):
+    """서버에서 이름이 prefix 로 시작하는 컬렉션을 {컬렉션 이름: Collection} 형태로 반환합니다. 조회 실패 시 None을 반환합니다."""
+    client = get_persistent_client()
+    if not client:
+        print(f"[-RAG-] Could not get ChromaDB client to load '{prefix}' collections.")
         return None
 
-    # 첫 번째 컬렉션을 기준으로 ChromaDB 인스턴스를 생성하고,
-    # 이후 다른 컬렉션들을 추가하는 방식 (ChromaDB의 merge 기능이 없으므로)
-    # 현재는 첫 번째 컬렉션을 반환하는 임시 방편 사용
-    first_collection_key = next(iter(all_collections))
-    return all_collections[first_collection_key]['vectordb']
+    collections = {}
+    try:
+        for collection in client.list_collections():
+            # 신버전은 이름 리스트를 반환하므로 컬렉션 객체를 다시 가져옵니다.
+            if isinstance(collection, str):
+                if not collection.startswith(prefix):
+                    continue
+                collection = client.get_collection(name=collection)
+            if collection.name.startswith(prefix):
+                collections[collection.name] = collection
+    except Exception as e:
+        print(f"[-RAG-] Error listing collections from ChromaDB: {e}")
+        return None
+    return collections
+
+# 컬렉션 메타데이터 값으로 컬렉션을 찾는 함수
+def find_collection_by_metadata(prefix: str, key: str, value):
+    """이름이 prefix 로 시작하고 컬렉션 메타데이터의 key 값이 value 인 컬렉션을 반환합니다. 없으면 None을 반환합니다."""
+    for collection in (_load_collections_by_prefix(prefix) or {}).values():
+        if (collection.metadata or {}).get(key) == value:
+            return collection
+    return None
+
+# 서버의 모든 파일 컬렉션을 로드하는 함수
+def get_all_file_search_collections():
+    """서버에서 사용 가능한 모든 파일 컬렉션(file_)을 {컬렉션 이름: Collection} 형태로 반환합니다.
+    한 번 로드한 결과는 notify_collection_changed() 가 호출될 때까지 캐시됩니다.
+    """
+    global file_search_collections_cache
+    if file_search_collections_cache is not None:
+        return file_search_collections_cache
+
+    collections = _load_collections_by_prefix("file_")
+    if collections is None:
+        # 조회 실패 결과는 캐시하지 않음
+        return {}
+    file_search_collections_cache = collections
+    return collections
+
+# 여러 컬렉션을 동시에 검색하는 retriever를 생성하는 함수
+def create_multi_collection_retriever(collections: dict, k: int = None, config: dict = None):
+    """주어진 컬렉션들({이름: Collection})을 한 번의 질문 임베딩으로 동시에 검색하는 retriever를 생성합니다.
+    애플리케이션 컨텍스트 밖(스트리밍 응답 등)에서 호출할 때는 config 를 직접 전달합니다.
+    """
+    if config is None:
+        config = current_app.config
+    return MultiCollectionRetriever(
+        collections=dict(collections),
+        embedding=models.get_embedding_model(),
+        k=k or config.get("RAG_GLOBAL_SEARCH_K", 3),
+        timeout=config.get("RAG_GLOBAL_SEARCH_TIMEOUT", 5.0),
+        max_workers=config.get("RAG_GLOBAL_SEARCH_MAX_WORKERS", 8)
+    )
+
+# 모든 문서를 검색 대상으로 하는 전역 retriever를 반환하는 함수
+def get_global_retriever(k: int = None):
+    """모든 파일 컬렉션을 동시에 검색하는 전역 retriever를 반환합니다. 컬렉션이 없으면 None을 반환합니다."""
+    collections = get_all_file_search_collections()
+    if not collections:
+        print("[-RAG-] No file collections available for global retriever.")
+        return None
+
+    return create_multi_collection_retriever(collections, k=k)
 
 # 벡터 데이터베이스 생성을 위한 내부 함수, 2025-08-19 jylee
 def _create_vectordb_instance(docs=None, collection_name=None):
@@ -164,31 +380,25 @@ def get_all_file_collections():
 
 # 모든 지식 베이스 컬렉션을 로드하고 반환하는 함수, 2025-10-10 jylee
 def get_all_kb_collections():
-    """서버에서 사용 가능한 모든 지식 베이스 컬렉션(kb_)을 로드하여 반환합니다."""
-    kb_collections = {}
-    client = get_persistent_client()
-    if not client:
-        print("[-RAG-] Could not get ChromaDB client to load KB collections.")
-        return kb_collections
-
-    try:
-        # 존재하는 컬렉션 리스트 정보
-        existing_collections = client.list_collections()
-        for collection in existing_collections:
-            if collection.name.startswith("kb_"):
-                try:
-                    vectordb_instance = _create_vectordb_instance(collection_name=collection.name)
-                    kb_collections[collection.name] = {
-                        'vectordb': vectordb_instance,
-                        'collection_name': collection.name
-                    }
-                    print(f"[-RAG-] Loaded existing KB collection: {collection.name}")
-                except Exception as e:
-                    print(f"[-RAG-] Error loading existing KB collection {collection.name}: {e}")
-    except Exception as e:
-        print(f"[-RAG-] Error listing collections from ChromaDB: {e}")
-    
+    """서버에서 사용 가능한 모든 지식 베이스 컬렉션(kb_)을 로드하여 반환합니다.
+    한 번 로드한 결과는 notify_collection_changed() 가 호출될 때까지 캐시됩니다.
+    """
+    global kb_collections_cache
+    if kb_collections_cache is not None:
+        return kb_collections_cache
+
+    loaded = _load_collections_by_prefix("kb_")
+    if loaded is None:
+        # 조회 실패 결과는 캐시하지 않음
+        return {}
+
+    # 검색은 MultiCollectionRetriever 가 컬렉션 객체로 직접 수행하므로 Chroma 래퍼는 만들지 않습니다.
+    kb_collections = {
+        name: {'collection': collection, 'collection_name': name}
+        for name, collection in loaded.items()
+    }
     print(f"[-RAG-] Found and loaded {len(kb_collections)} KB collections.")
+    kb_collections_cache = kb_collections
     return kb_collections
 
 # 지식 베이스 컬렉션에서 retriever를 생성하는 함수, 2025-09-12 jylee
@@ -236,6 +446,7 @@ def delete_file_collection(filename: str):
                 print(f"[-RAG-] Deleted collection '{collection_name}' from ChromaDB.")
             else:
                 print(f"[-RAG-] Could not get ChromaDB client to delete collection '{collection_name}'.")
+            notify_collection_changed(collection_name)
 
             return True
         except Exception as e:
@@ -278,5 +489,6 @@ def load_existing_collections():
 
 # 애플리케이션 컨텍스트가 생성될 때 호출될 함수
 def init_app(app):
+    init_global_search_executor(app.config.get("RAG_GLOBAL_SEARCH_MAX_WORKERS", 8))
     with app.app_context():
         load_existing_collections()
@@ -0,0 +1,24 @@
+from flask import Blueprint, Response
+
+from pybo.rag import metrics, models as rag_models
+
+# Prometheus 수집용 지표 블루프린트 (/metrics)
+bp = Blueprint('metrics', __name__)
+
+# Prometheus 텍스트 형식 지표
+# - 요청 수/지연 시간(엔드포인트별), RAG 단계별 소요 시간, 임베딩/ChromaDB 조회 시간
+# - LLM 동시 실행/대기 수, 평가 큐 길이, 캐시 적중률
+# 값은 프로세스 단위 누적값이므로 워커가 여러 개이면 워커별로 수집한다.
+@bp.route('/metrics')
+def prometheus_metrics():
+    gauges = []
+    if rag_models.llm_client is not None:
+        stats = rag_models.llm_client.get_stats()
+        gauges.extend([
+            ("rag_llm_in_flight", "LLM generation requests currently running.", {"priority": "all"}, stats["in_flight"]),
+            ("rag_llm_in_flight", "LLM generation requests currently running.", {"priority": "background"}, stats["background_in_flight"]),
+            ("rag_llm_waiting", "LLM generation requests waiting for a slot.", {"priority": "foreground"}, stats["waiting"]),
+            ("rag_llm_waiting", "LLM generation requests waiting for a slot.", {"priority": "background"}, stats["background_waiting"]),
+            ("rag_llm_max_in_flight", "Maximum concurrent LLM generation requests.", {}, stats["max_in_flight"]),
+        ])
+    return Response(metrics.render_prometheus_metrics(gauges), mimetype='text/plain; version=0.0.4')